@@ -0,0 +1,117 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时仅支持 gzip
+    brotli = None
+
+# 流式响应（NDJSON / SSE）需要逐条送达，不做压缩
+_STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+_COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+
+def _parse_accept_encoding(value: str) -> dict[str, float]:
+    encodings = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            encodings[token.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """按 Accept-Encoding 选择编码：优先 br（需安装 brotli），其次 gzip"""
+    encodings = _parse_accept_encoding(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    if brotli is not None and encodings.get("br", wildcard) > 0:
+        return "br"
+    if encodings.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        # 压缩后字节不同，强 ETag 降为弱 ETag（条件请求按弱比较仍可命中）
+        headers["etag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """按内容协商压缩完整响应体（gzip / brotli），小于 minimum_size 的响应保持原样
+
+    同一 URL 是否压缩取决于 Accept-Encoding 与响应大小，因此可压缩类型的响应一律带 Vary: Accept-Encoding；
+    ETag 只按请求判断：协商出编码时所有响应（含过小未压缩的 200 与 304）的强 ETag 统一降为弱 ETag，
+    同一请求的 200 与 304 校验值始终一致。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+
+        start_message: Message | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if encoding is not None:
+                _weaken_etag(headers)
+            if start_message["status"] == 304:
+                headers.add_vary_header("Accept-Encoding")
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            compressible = (
+                "content-encoding" not in headers
+                and not content_type.startswith(_STREAMING_TYPES)
+                and content_type.startswith(_COMPRESSIBLE_TYPES)
+            )
+            if not compressible or encoding is None or message.get("more_body", False) or len(body) < self.minimum_size:
+                # 流式/已编码/不可压缩/未协商出编码/过小的响应原样透传
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -26,12 +26,68 @@ class Settings(BaseSettings):
     qweather_api_key: str = os.getenv("QWEATHER_API_KEY", "")
     qweather_geo: str = os.getenv("QWEATHER_GEO", "https://geoapi.qweather.com")
     qweather_base: str = os.getenv("QWEATHER_BASE", "https://devapi.qweather.com")
+    # 和风天气 HTTP 客户端（进程级连接池）
+    qweather_timeout: float = float(os.getenv("QWEATHER_TIMEOUT", "12"))
+    qweather_connect_timeout: float = float(os.getenv("QWEATHER_CONNECT_TIMEOUT", "5"))
+    qweather_max_connections: int = int(os.getenv("QWEATHER_MAX_CONNECTIONS", "100"))
+    qweather_max_keepalive: int = int(os.getenv("QWEATHER_MAX_KEEPALIVE", "20"))
+    qweather_keepalive_expiry: float = float(os.getenv("QWEATHER_KEEPALIVE_EXPIRY", "60"))
+    qweather_http2: bool = os.getenv("QWEATHER_HTTP2", "false").lower() == "true"
+    # 和风天气一级缓存后端：memory（进程内）/ mmap（同机多 worker 共享）/ redis
+    qweather_cache_backend: str = os.getenv("QWEATHER_CACHE_BACKEND", "memory")
+    qweather_cache_maxsize: int = int(os.getenv("QWEATHER_CACHE_MAXSIZE", "1024"))
+    # memory 后端的内存预算（字节），按条目实际大小淘汰；0 为按条目数 QWEATHER_CACHE_MAXSIZE 淘汰
+    qweather_cache_max_bytes: int = int(os.getenv("QWEATHER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    qweather_cache_mmap_path: str = os.getenv("QWEATHER_CACHE_MMAP_PATH", "")
+    qweather_cache_mmap_slots: int = int(os.getenv("QWEATHER_CACHE_MMAP_SLOTS", "2048"))
+    qweather_cache_mmap_slot_size: int = int(os.getenv("QWEATHER_CACHE_MMAP_SLOT_SIZE", "16384"))
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # 和风天气上游配额：每日调用上限（0 不限）、每秒速率与突发量（速率 0 不限）
+    qweather_daily_quota: int = int(os.getenv("QWEATHER_DAILY_QUOTA", "1000"))
+    qweather_rate_per_second: float = float(os.getenv("QWEATHER_RATE_PER_SECOND", "10"))
+    qweather_burst: int = int(os.getenv("QWEATHER_BURST", "20"))
+    # 和风天气熔断：连续失败次数、冷却秒数、延迟 SLO（秒）；保留多少个最近成功结果用于故障降级
+    qweather_breaker_failures: int = int(os.getenv("QWEATHER_BREAKER_FAILURES", "5"))
+    qweather_breaker_cooldown: float = float(os.getenv("QWEATHER_BREAKER_COOLDOWN", "30"))
+    qweather_latency_slo: float = float(os.getenv("QWEATHER_LATENCY_SLO", "3"))
+    qweather_stale_max_entries: int = int(os.getenv("QWEATHER_STALE_MAX_ENTRIES", "2048"))
+    # 和风天气重试：最多尝试次数、退避基数/上限（秒）、重试预算比例；可选对冲请求（超过近期 p95 时再发一次）
+    qweather_retry_max_attempts: int = int(os.getenv("QWEATHER_RETRY_MAX_ATTEMPTS", "3"))
+    qweather_retry_base_delay: float = float(os.getenv("QWEATHER_RETRY_BASE_DELAY", "0.2"))
+    qweather_retry_max_delay: float = float(os.getenv("QWEATHER_RETRY_MAX_DELAY", "2"))
+    qweather_retry_budget_ratio: float = float(os.getenv("QWEATHER_RETRY_BUDGET_RATIO", "0.1"))
+    qweather_hedge_enabled: bool = os.getenv("QWEATHER_HEDGE_ENABLED", "false").lower() == "true"
+    qweather_hedge_min_delay: float = float(os.getenv("QWEATHER_HEDGE_MIN_DELAY", "0.1"))
+    # 热门城市预取：扫描间隔、城市数、提前量（秒）、每轮最多上游请求数
+    prefetch_enabled: bool = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+    prefetch_interval: int = int(os.getenv("PREFETCH_INTERVAL", "60"))
+    prefetch_top_n: int = int(os.getenv("PREFETCH_TOP_N", "50"))
+    prefetch_lead_seconds: float = float(os.getenv("PREFETCH_LEAD_SECONDS", "120"))
+    prefetch_max_per_tick: int = int(os.getenv("PREFETCH_MAX_PER_TICK", "30"))
+    # 实时天气订阅（WebSocket / SSE）每个城市的轮询间隔（秒）
+    weather_subscribe_interval: float = float(os.getenv("WEATHER_SUBSCRIBE_INTERVAL", "60"))
+    # 按坐标查询天气：优先吸附到该半径（公里）内最近的已知城市ID（0 为关闭），否则对齐到网格（度，最小 0.01）
+    weather_coord_snap_km: float = float(os.getenv("WEATHER_COORD_SNAP_KM", "10"))
+    weather_coord_grid: float = float(os.getenv("WEATHER_COORD_GRID", "0.05"))
+    # 批量天气接口的上游并发上限
+    weather_batch_concurrency: int = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "8"))
+    # 和风天气二级缓存（weather_cache 表，异步批量写入）
+    weather_cache_l2_enabled: bool = os.getenv("WEATHER_CACHE_L2", "true").lower() == "true"
+    weather_cache_flush_interval: float = float(os.getenv("WEATHER_CACHE_FLUSH_INTERVAL", "2"))
+    # 本地城市索引（backend/gazetteer/build_index.py 生成），为空时使用 backend/gazetteer/locations.idx
+    gazetteer_index_path: str = os.getenv("GAZETTEER_INDEX", "")
     
     # 安全配置
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 30
+    # 响应压缩阈值（字节），小于该大小的响应不压缩
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    # 管理接口令牌（未设置时禁用 /api/admin/*）
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    # .env 变更检测间隔（秒）
+    config_watch_interval: float = float(os.getenv("CONFIG_WATCH_INTERVAL", "5"))
     
     # CORS配置 - 从环境变量解析逗号分隔的字符串
     @property
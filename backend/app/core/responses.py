@@ -0,0 +1,99 @@
+import time
+import hashlib
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖：未安装时仅提供 JSON
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+class MsgPackResponse(Response):
+    """MessagePack 响应，供内部服务使用（Accept: application/msgpack）"""
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and ("application/msgpack" in accept or "application/x-msgpack" in accept)
+
+
+def negotiate(request: Request, content: Any) -> Response:
+    """按 Accept 头选择 MessagePack 或 orjson 序列化"""
+    if wants_msgpack(request):
+        return MsgPackResponse(content)
+    return ORJSONResponse(content)
+
+
+def entry_response(request: Request, entry: Any) -> Response:
+    """返回 qweather 缓存条目：直接写出上游 JSON 原文 entry.raw（不解析、不重新序列化），
+    仅在请求 MessagePack 时使用解析后的 entry.data"""
+    if wants_msgpack(request):
+        return MsgPackResponse(entry.data)
+    return Response(content=entry.raw, media_type="application/json")
+
+
+def _parse_update_time(value: str) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """If-None-Match 优先（弱比较，兼容压缩后的 W/ 前缀）；否则按 If-Modified-Since 判断"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def conditional_entry_response(request: Request, entry: Any, location: str) -> Response:
+    """天气接口的条件请求：ETag 由接口类型 + 城市 + 上游 updateTime 生成，
+    命中 If-None-Match / If-Modified-Since 时返回 304（不读取、不输出缓存内容）；
+    max-age 取缓存条目距软过期的剩余秒数"""
+    update_time = entry.update_time
+    updated = _parse_update_time(update_time) if update_time else None
+    if entry.stale or updated is None:
+        # 降级数据与业务错误不参与协商缓存，客户端每次都需重新验证
+        response = entry_response(request, entry)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    fmt = "msgpack" if wants_msgpack(request) else "json"
+    digest = hashlib.blake2b(f"{entry.kind}|{location}|{update_time}|{fmt}".encode("utf-8"), digest_size=12)
+    etag = f'"{digest.hexdigest()}"'
+    max_age = max(0, int(entry.soft_expires - time.time()))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept",
+    }
+    if _not_modified(request, etag, updated):
+        return Response(status_code=304, headers=headers)
+    response = entry_response(request, entry)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,109 @@
+import os
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# 明确从 backend/.env 加载环境变量，避免启动目录不同找不到 .env
+ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """运行时可热更新的配置快照（不可变）
+
+    热路径只读取内存中的快照，不做任何文件 I/O；
+    .env 的 mtime 变化（后台轮询）、SIGHUP 或管理接口触发时整体替换快照。
+    """
+    qweather_api_key: str
+    qweather_base: str
+    qweather_geo: str
+    pinecone_api_key: str
+    gemini_api_key: str
+    gemini_model: str
+    env_mtime: Optional[float]
+
+
+def _env_mtime() -> Optional[float]:
+    try:
+        return ENV_PATH.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _build_snapshot(mtime: Optional[float]) -> RuntimeConfig:
+    # .env 中的值覆盖进程环境变量，与原先 override=True 的行为一致
+    load_dotenv(dotenv_path=ENV_PATH, override=True)
+    return RuntimeConfig(
+        qweather_api_key=os.getenv("QWEATHER_API_KEY", ""),
+        qweather_base=os.getenv("QWEATHER_BASE", "https://devapi.qweather.com"),
+        qweather_geo=os.getenv("QWEATHER_GEO", "https://geoapi.qweather.com"),
+        pinecone_api_key=os.getenv("PINECONE_API_KEY", ""),
+        gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
+        gemini_model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+        env_mtime=mtime,
+    )
+
+
+_snapshot: RuntimeConfig = _build_snapshot(_env_mtime())
+_watch_task: Optional[asyncio.Task] = None
+
+
+def get_runtime_config() -> RuntimeConfig:
+    """获取当前配置快照（无 I/O）"""
+    return _snapshot
+
+
+def reload_runtime_config(force: bool = False) -> bool:
+    """.env 的 mtime 变化（或 force=True）时重新加载，返回是否替换了快照"""
+    global _snapshot
+    mtime = _env_mtime()
+    if not force and mtime == _snapshot.env_mtime:
+        return False
+    _snapshot = _build_snapshot(mtime)
+    logger.info("Runtime config reloaded from %s", ENV_PATH)
+    return True
+
+
+async def _watch_loop(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            reload_runtime_config()
+        except Exception as e:
+            # 避免异常中断轮询
+            logger.error(f"Runtime config reload error: {e}")
+
+
+def start_watcher(interval_seconds: float = 5.0):
+    """启动后台 mtime 轮询，并注册 SIGHUP 强制重载（仅 Unix）"""
+    global _watch_task
+    if _watch_task and not _watch_task.done():
+        return
+    _watch_task = asyncio.create_task(_watch_loop(interval_seconds), name="runtime-config-watcher")
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_runtime_config, True)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # Windows 等平台不支持 SIGHUP
+        pass
+
+
+async def stop_watcher():
+    global _watch_task
+    try:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass
+    if _watch_task:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
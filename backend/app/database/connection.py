@@ -41,12 +41,47 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
+def _add_missing_columns(sync_conn, table_name: str, column_names: list):
+    """create_all 不会修改已有表：为已部署的表补齐后续新增的可空列（及其索引）"""
+    from sqlalchemy import inspect, text
+    existing = {c["name"] for c in inspect(sync_conn).get_columns(table_name)}
+    table = Base.metadata.tables[table_name]
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        col_type = column.type.compile(dialect=sync_conn.dialect)
+        sync_conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {col_type} NULL"))
+        for index in table.indexes:
+            if name in index.columns:
+                index.create(sync_conn)
+        logger.info(f"Added column {table_name}.{name}")
+
+def _add_missing_enum_values(sync_conn, table_name: str, column_name: str):
+    """MySQL 的 ENUM 列不会随模型更新：为已部署的表补齐新增的枚举值（保留已有值的顺序）"""
+    from sqlalchemy import inspect, text
+    if sync_conn.dialect.name != "mysql":
+        return
+    existing = next((c for c in inspect(sync_conn).get_columns(table_name) if c["name"] == column_name), None)
+    current = list(getattr(existing["type"], "enums", None) or []) if existing else []
+    column = Base.metadata.tables[table_name].c[column_name]
+    missing = [v for v in column.type.enums if v not in current]
+    if not current or not missing:
+        return
+    values = ", ".join("'" + v.replace("'", "''") + "'" for v in current + missing)
+    null = "NULL" if column.nullable else "NOT NULL"
+    sync_conn.execute(text(f"ALTER TABLE {table_name} MODIFY COLUMN {column_name} ENUM({values}) {null}"))
+    logger.info(f"Added enum values {missing} to {table_name}.{column_name}")
+
 async def init_db():
     """初始化数据库"""
     try:
         async with engine.begin() as conn:
             # 创建所有表
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns, "cities", ["location_id", "adm1", "adm2", "location_resolved_at"])
+            await conn.run_sync(_add_missing_columns, "weather_cache", ["cache_key", "fetched_at", "soft_expires_at"])
+            await conn.run_sync(_add_missing_enum_values, "weather_cache", "weather_type")
             logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
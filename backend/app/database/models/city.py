@@ -15,6 +15,11 @@ class City(BaseModel):
     longitude = Column(Numeric(11, 8), nullable=True)
     search_count = Column(Integer, default=1, nullable=False)
     last_searched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # 解析得到的和风城市ID与行政区划（坐标复用 latitude/longitude）
+    location_id = Column(String(32), nullable=True, index=True)
+    adm1 = Column(String(100), nullable=True)
+    adm2 = Column(String(100), nullable=True)
+    location_resolved_at = Column(DateTime, nullable=True)
     
     # 关联关系（按名称+省份映射，非外键）
     favorites = relationship(
@@ -60,6 +65,8 @@ class City(BaseModel):
                 existing_city.latitude = city_data['latitude']
             if city_data.get('longitude'):
                 existing_city.longitude = city_data['longitude']
+            if city_data.get('location_id'):
+                existing_city.location_id = city_data['location_id']
             return existing_city
         else:
             # 创建新记录
@@ -9,12 +9,16 @@ class WeatherCache(BaseModel):
     
     __tablename__ = "weather_cache"
     
+    # qweather 二级缓存条目：按缓存键哈希定位，city_name 存放请求的 location（城市ID或查询词）
+    cache_key = Column(String(64), nullable=True, unique=True, index=True)
     city_name = Column(String(100), nullable=False, index=True)
     province = Column(String(100), nullable=True)
     # 新增：城市外键，匹配 City.weather_caches 关联
     city_id = Column(Integer, ForeignKey("cities.id"), nullable=True, index=True)
-    weather_type = Column(Enum('now', '24h', '7d', name='weather_type_enum'), nullable=False)
+    weather_type = Column(Enum('now', '24h', '7d', '3d', 'geo', name='weather_type_enum'), nullable=False)
     weather_data = Column(Text, nullable=False)  # JSON格式存储
+    fetched_at = Column(DateTime, nullable=True)  # 上游拉取时间（UTC），updated_at 为数据库本地时间且在批量落库时才写入
+    soft_expires_at = Column(DateTime, nullable=True)  # 软过期：之后返回旧值并后台刷新
     expires_at = Column(DateTime, nullable=False, index=True)
     
     # 关联关系
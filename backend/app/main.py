@@ -1,8 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from contextlib import asynccontextmanager
 
+from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+
 
 def _get_allowed_origins() -> list[str]:
     allow_origins = os.getenv("ALLOW_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
@@ -14,18 +17,59 @@ async def lifespan(app: FastAPI):
     # 启动时初始化数据库
     from app.database.connection import init_db, close_db, AsyncSessionLocal
     from app.services.scheduler import EmailScheduleWorker
+    from app.services.weather_cache_service import WeatherCacheWriter
+    from app.services.prefetcher import WeatherPrefetcher
+    from app.services.weather_hub import weather_hub
+    from app.services import qweather, gazetteer
+    from app.core import runtime_config
+
+    # 监听 .env 变更与 SIGHUP，热更新配置快照
+    runtime_config.start_watcher(settings.config_watch_interval)
 
     try:
         await init_db()
         print("✅ 数据库初始化成功")
     except Exception as e:
         print(f"❌ 数据库初始化失败: {e}")
+
+    # 初始化共享和风天气 HTTP 客户端并预热连接
+    try:
+        await qweather.startup()
+        print("🌐 和风天气连接池已就绪")
+    except Exception as e:
+        print(f"⚠️ 和风天气连接预热失败: {e}")
+
+    # 加载本地城市索引（mmap），/api/geo 优先本地检索
+    if gazetteer.load(settings.gazetteer_index_path or None) is not None:
+        print("🗺️ 本地城市索引已加载")
+
+    # 接入数据库二级缓存：L1 未命中先查 weather_cache 表，写入异步批量落库
+    cache_writer = None
+    if settings.weather_cache_l2_enabled:
+        cache_writer = WeatherCacheWriter(AsyncSessionLocal, flush_interval=settings.weather_cache_flush_interval)
+        cache_writer.start()
+        qweather.enable_l2(AsyncSessionLocal, cache_writer)
+        print("🗄️ 天气二级缓存已启用")
     
     # 启动定时任务调度器（每60秒扫描一次）
     worker = EmailScheduleWorker(AsyncSessionLocal, interval_seconds=60, batch_size=20)
     worker.start()
     print("🕒 定时任务调度器已启动")
 
+    # 热门/收藏城市预取：在缓存过期前提前刷新
+    prefetcher = None
+    if settings.prefetch_enabled:
+        prefetcher = WeatherPrefetcher(
+            AsyncSessionLocal,
+            interval_seconds=settings.prefetch_interval,
+            top_n=settings.prefetch_top_n,
+            lead_seconds=settings.prefetch_lead_seconds,
+            max_per_tick=settings.prefetch_max_per_tick,
+        )
+        prefetcher.start()
+        app.state.prefetcher = prefetcher
+        print("🔄 天气预取任务已启动")
+
     try:
         yield
     finally:
@@ -35,6 +79,15 @@ async def lifespan(app: FastAPI):
             print("🛑 定时任务调度器已停止")
         except Exception:
             pass
+        if prefetcher is not None:
+            await prefetcher.stop()
+        await weather_hub.stop()
+        qweather.disable_l2()
+        if cache_writer is not None:
+            await cache_writer.stop()
+        await qweather.shutdown()
+        gazetteer.close()
+        await runtime_config.stop_watcher()
         await close_db()
 
 
@@ -44,12 +97,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 按 Accept-Encoding 压缩较大的响应（gzip / brotli）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_get_allowed_origins(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 按坐标查询天气时返回实际使用的 location
+    expose_headers=["X-Weather-Location"],
 )
 
 
@@ -59,7 +117,11 @@ from app.routers.auth import router as auth_router  # noqa: E402
 from app.routers.favorites import router as favorites_router  # noqa: E402
 from app.routers.notifications import router as notifications_router  # noqa: E402
 from app.routers.rag import router as rag_router  # noqa: E402
-from app.services import qweather  # noqa: E402
+from app.routers.astronomy import router as astronomy_router  # noqa: E402
+from app.services import qweather, gazetteer  # noqa: E402
+from app.core import runtime_config  # noqa: E402
+from app.services.qweather_quota import quota_governor  # noqa: E402
+from app.services.weather_hub import weather_hub  # noqa: E402
 
 
 app.include_router(geo_router, prefix="/api")
@@ -68,6 +130,7 @@ app.include_router(auth_router, prefix="/api")
 app.include_router(favorites_router, prefix="/api")
 app.include_router(notifications_router, prefix="/api")
 app.include_router(rag_router, prefix="/api")
+app.include_router(astronomy_router, prefix="/api")
 
 
 @app.get("/api/health")
@@ -82,3 +145,29 @@ async def health_check():
     return {"status": "ok", "hasApiKey": has_key, "hosts": {"base": base, "geo": geo}}
 
 
+@app.get("/api/metrics")
+async def metrics():
+    # 进程内计数器，便于观察缓存命中与上游调用量
+    prefetcher = getattr(app.state, "prefetcher", None)
+    return {
+        "qweather": qweather.get_stats(),
+        "quota": quota_governor.stats(),
+        "prefetch": prefetcher.stats if prefetcher is not None else None,
+        "gazetteer": gazetteer.stats(),
+        "subscriptions": weather_hub.get_stats(),
+    }
+
+
+@app.get("/api/metrics/cache")
+async def cache_metrics(limit: int = Query(default=20, ge=0, le=500)):
+    # 一级缓存按类型的内存占用与最大的若干条目
+    return qweather.memory_report(limit)
+
+
+@app.post("/api/admin/reload-config")
+async def reload_config(x_admin_token: str | None = Header(default=None)):
+    # 立即重新加载 backend/.env（如轮换密钥后无需等待 mtime 轮询）
+    if not settings.admin_token or x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="禁止访问")
+    runtime_config.reload_runtime_config(force=True)
+    return {"message": "配置已重新加载"}
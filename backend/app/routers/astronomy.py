@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.responses import negotiate
+from app.database.connection import get_db
+from app.schemas.astronomy import AstronomyBatchRequest, ASTRONOMY_MAX_DAYS
+from app.services import astronomy
+from app.services.city_service import city_service
+
+router = APIRouter(prefix="/astronomy", tags=["astronomy"], default_response_class=ORJSONResponse)
+
+
+def _check_tz(tz: str | None) -> None:
+    if not tz:
+        return
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=422, detail=f"未知时区: {tz}")
+
+
+def _today(tz: str | None) -> date:
+    return datetime.now(ZoneInfo(tz or astronomy.DEFAULT_TZ)).date()
+
+
+async def _resolve(db: AsyncSession, location_id: str) -> dict:
+    loc = await city_service.get_location(db, location_id)
+    if loc is None:
+        raise HTTPException(status_code=404, detail=f"未找到城市坐标: {location_id}")
+    return loc
+
+
+@router.get("")
+async def get_astronomy(
+    request: Request,
+    location: str | None = Query(default=None, description="和风城市ID（与 lat/lon 二选一）"),
+    lat: float | None = Query(default=None, ge=-90, le=90, description="纬度"),
+    lon: float | None = Query(default=None, ge=-180, le=180, description="经度"),
+    tz: str | None = Query(default=None, description="IANA 时区名，按城市ID查询时默认使用城市时区"),
+    start: date | None = Query(default=None, alias="date", description="起始日期，默认当地今天"),
+    days: int = Query(default=7, ge=1, le=ASTRONOMY_MAX_DAYS, description="天数"),
+    db: AsyncSession = Depends(get_db),
+):
+    """日出、日落、正午、昼长（分钟）与月相：本地计算，不请求和风"""
+    _check_tz(tz)
+    if location:
+        loc = await _resolve(db, location)
+        tz = tz or loc["tz"]
+    elif lat is not None and lon is not None:
+        loc = {"id": None, "name": None, "lat": lat, "lon": lon, "tz": tz}
+    else:
+        raise HTTPException(status_code=422, detail="需要 location 或 lat/lon")
+    dates = astronomy.date_range(start or _today(tz), days)
+    table = astronomy.for_location(loc["lat"], loc["lon"], dates, tz)
+    return negotiate(request, {
+        "code": "200",
+        "location": {**loc, "tz": tz or astronomy.DEFAULT_TZ},
+        "daily": table.daily(0),
+        "source": "local",
+    })
+
+
+@router.post("/batch")
+async def get_astronomy_batch(request: Request, req: AstronomyBatchRequest, db: AsyncSession = Depends(get_db)):
+    """批量计算（如多个城市的全年日出日落）：所有城市 × 日期一次向量化计算，结果按城市列式返回"""
+    if not req.locations and not req.points:
+        raise HTTPException(status_code=422, detail="需要 locations 或 points")
+    dates = astronomy.year_dates(req.year) if req.year else astronomy.date_range(req.start or _today(None), req.days)
+    if (len(req.locations) + len(req.points)) * len(dates) > astronomy.MAX_CITY_DAYS:
+        raise HTTPException(status_code=422, detail=f"城市数 × 天数不能超过 {astronomy.MAX_CITY_DAYS}")
+
+    places = []
+    errors = {}
+    for location_id in dict.fromkeys(req.locations):
+        loc = await city_service.get_location(db, location_id)
+        if loc is None:
+            errors[location_id] = "未找到城市坐标"
+        else:
+            places.append(loc)
+    for point in req.points:
+        _check_tz(point.tz)
+        places.append({"id": None, "name": point.name, "lat": point.lat, "lon": point.lon, "tz": point.tz})
+
+    results = []
+    if places:
+        offsets = astronomy.utc_offsets([p["tz"] for p in places], dates)
+        table = astronomy.compute([p["lat"] for p in places], [p["lon"] for p in places], dates, offsets)
+        results = [
+            {"location": {**p, "tz": p["tz"] or astronomy.DEFAULT_TZ}, **table.columns(i)}
+            for i, p in enumerate(places)
+        ]
+    return negotiate(request, {"results": results, "errors": errors, "source": "local"})
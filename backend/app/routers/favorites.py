@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal
 from jose import JWTError
 
+from app.core.config import settings
 from app.database.connection import get_db
+from app.services import qweather
 from app.services.city_service import city_service
 from app.services.user_service import user_service
+from app.services.weather_metrics import compare_summary
 from app.schemas.favorites import (
     FavoriteCityRequest,
     FavoriteCityResponse
 )
+from app.schemas.weather import CompareMetric, WEATHER_BATCH_MAX_LOCATIONS
 
 router = APIRouter(prefix="/favorites", tags=["收藏城市"])
 
@@ -96,6 +100,30 @@ async def get_favorite_cities(
     ]
 
 
+@router.get("/compare")
+async def compare_favorite_cities(
+    day: int = Query(default=1, ge=0, le=6, description="第几天（0 为今天，1 为明天）"),
+    metric: CompareMetric = Query(default="temp_max", description="比较的逐日指标"),
+    order: Literal["desc", "asc"] = Query(default="desc", description="desc 取最大（如最暖），asc 取最小"),
+    current_user_id: int = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """比较收藏城市的逐日预报，如默认参数即“明天最暖的收藏城市”"""
+    favorites = await city_service.get_user_favorites(db, current_user_id)
+    names = {}
+    unresolved = []
+    for fav in favorites[:WEATHER_BATCH_MAX_LOCATIONS]:
+        location_id = await city_service.resolve_location_id(db, fav.city_name, fav.province)
+        if location_id:
+            names.setdefault(location_id, fav.city_name)
+        else:
+            unresolved.append(fav.city_name)
+    entries, errors = await qweather.daily_many(list(names), settings.weather_batch_concurrency)
+    result = compare_summary(entries, errors, day, metric, descending=order == "desc", names=names)
+    result["unresolved"] = unresolved
+    return result
+
+
 @router.get("/popular", response_model=List[dict])
 async def get_popular_cities(
     limit: int = 10,
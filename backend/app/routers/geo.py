@@ -1,12 +1,78 @@
-from fastapi import APIRouter, Query
-from app.services import qweather
+import re
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import ORJSONResponse
+from app.core.responses import entry_response, negotiate
+from app.schemas.geo import ReverseGeocodeBatchRequest
+from app.services import qweather, gazetteer
 from typing import List, Dict, Any
 
-router = APIRouter(prefix="", tags=["geo"])
+router = APIRouter(prefix="", tags=["geo"], default_response_class=ORJSONResponse)
+
+# 本地索引数据同样来自和风城市列表
+LOCAL_REFER = {"sources": ["QWeather"], "license": ["QWeather Developers License"]}
+# 和风坐标查询格式：经度,纬度
+_COORDINATES = re.compile(r"^\s*(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,2}(?:\.\d+)?)\s*$")
+
+
+def _parse_coordinates(query: str) -> tuple[float, float] | None:
+    match = _COORDINATES.match(query)
+    if not match:
+        return None
+    lon, lat = float(match.group(1)), float(match.group(2))
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        return None
+    return lat, lon
+
+
+def _local_response(request: Request, locations: List[Dict[str, Any]], **extra):
+    return negotiate(request, {"code": "200", "location": locations, **extra, "refer": LOCAL_REFER})
+
+
+async def _reverse(request: Request, lat: float, lon: float):
+    found = gazetteer.nearest(lat, lon)
+    if found is not None:
+        location, distance = found
+        return _local_response(request, [location], distanceKm=round(distance, 2))
+    # 本地索引未加载或附近没有地点：交给和风按坐标查询（两位小数约 1 公里，提高缓存命中）
+    entry = await qweather.search_city_entry(f"{lon:.2f},{lat:.2f}")
+    return entry_response(request, entry)
+
 
 @router.get("/geo")
-async def geo_lookup(query: str = Query(min_length=1, description="城市名，如：北京")):
-    """城市搜索API - 直接使用和风天气原生API"""
-    return await qweather.search_city(query)
+async def geo_lookup(request: Request, query: str = Query(min_length=1, description="城市名，如：北京")):
+    """城市搜索API - 优先本地城市索引，未命中再请求和风天气原生API"""
+    coordinates = _parse_coordinates(query)
+    if coordinates is not None:
+        # 定位得到的 “经度,纬度” 直接走本地反向地理编码
+        return await _reverse(request, *coordinates)
+    locations = gazetteer.search(query)
+    if locations:
+        return _local_response(request, locations)
+    entry = await qweather.search_city_entry(query)
+    return entry_response(request, entry)
+
+
+@router.get("/geo/reverse")
+async def geo_reverse(
+    request: Request,
+    lat: float = Query(ge=-90, le=90, description="纬度"),
+    lon: float = Query(ge=-180, le=180, description="经度"),
+):
+    """反向地理编码：坐标 -> 最近的和风城市ID与名称"""
+    return await _reverse(request, lat, lon)
 
 
+@router.post("/geo/reverse")
+async def geo_reverse_batch(request: Request, req: ReverseGeocodeBatchRequest):
+    """批量反向地理编码（仅本地索引）；超出范围或未加载索引时对应项 location 为 null"""
+    results = []
+    for point in req.points:
+        found = gazetteer.nearest(point.lat, point.lon)
+        results.append({
+            "lat": point.lat,
+            "lon": point.lon,
+            "location": found[0] if found else None,
+            "distanceKm": round(found[1], 2) if found else None,
+        })
+    return negotiate(request, {"results": results, "indexLoaded": gazetteer.get_gazetteer() is not None})
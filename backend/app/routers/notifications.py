@@ -10,8 +10,8 @@ from app.schemas.notifications import (
 )
 from app.services.notification_service import notification_service
 from app.services.user_service import user_service
+from app.services.city_service import city_service
 from app.database.models import UserFavorite, EmailSchedule
-from app.services import qweather
 
 router = APIRouter(prefix="/notifications", tags=["邮件通知"])
 security = HTTPBearer()
@@ -48,18 +48,11 @@ async def resolve_city(db: AsyncSession, user_id: int, req_city_id: str | None,
     raise HTTPException(status_code=422, detail="缺少城市参数")
 
 
-async def get_qweather_id(city_name: str, province: str | None) -> str:
-    # 调用和风城市查询，尽量精确匹配 省份+城市
-    query = f"{province or ''} {city_name}".strip()
-    data = await qweather.search_city(query)
-    locs = data.get("location", []) if isinstance(data, dict) else []
-    if not locs:
+async def get_qweather_id(db: AsyncSession, city_name: str, province: str | None) -> str:
+    location_id = await city_service.resolve_location_id(db, city_name, province)
+    if not location_id:
         raise HTTPException(status_code=404, detail="未找到城市的和风ID")
-    # 优先精确匹配
-    for x in locs:
-        if x.get("name") == city_name and ((province is None) or x.get("adm1") == province):
-            return x.get("id")
-    return locs[0].get("id")
+    return location_id
 
 
 @router.post("/send-weather", response_model=SendWeatherEmailResponse)
@@ -84,10 +77,10 @@ async def send_weather_email(
         raise HTTPException(status_code=422, detail="缺少城市名称")
 
     # 解析和风ID（预览与发送都需要）
-    location_id = await get_qweather_id(city_name, province)
+    location_id = await get_qweather_id(db, city_name, province)
 
     if req.dry_run:
-        preview = await notification_service.preview(location_id, city_name)
+        preview = await notification_service.preview(location_id, city_name, db)
         quota = await notification_service._check_quota(db, user_id)
         return SendWeatherEmailResponse(message="预览成功", preview=preview, quota_remaining=quota)
 
@@ -119,7 +112,7 @@ async def schedule_weather_email(
     if not city_name:
         raise HTTPException(status_code=422, detail="缺少城市名称")
 
-    location_id = await get_qweather_id(city_name, province)
+    location_id = await get_qweather_id(db, city_name, province)
 
     next_run = notification_service.next_run_for(req.type, req.time, req.date, req.timezone)
     from datetime import timezone
@@ -1,22 +1,291 @@
-from fastapi import APIRouter, Query
-from app.services import qweather
+import asyncio
+from typing import List, Literal
 
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from app.core.config import settings
+from app.core.responses import conditional_entry_response, entry_response, negotiate
+from app.schemas.weather import CompareMetric, WeatherBatchRequest, WeatherKind
+from app.services import qweather, gazetteer
+from app.services.weather_hub import weather_hub, Subscriber, MAX_LOCATIONS_PER_SUBSCRIBER
+from app.services.weather_metrics import compare_summary
 
-router = APIRouter(prefix="/weather", tags=["weather"])
+
+router = APIRouter(prefix="/weather", tags=["weather"], default_response_class=ORJSONResponse)
 
 
 @router.get("/now")
-async def get_now(location: str = Query(min_length=1, description="和风城市ID")):
-    return await qweather.weather_now(location)
+async def get_now(request: Request, location: str = Query(min_length=1, description="和风城市ID")):
+    entry = await qweather.weather_entry("now", location)
+    return conditional_entry_response(request, entry, location)
 
 
 @router.get("/24h")
-async def get_24h(location: str = Query(min_length=1, description="和风城市ID")):
-    return await qweather.weather_24h(location)
+async def get_24h(request: Request, location: str = Query(min_length=1, description="和风城市ID")):
+    entry = await qweather.weather_entry("24h", location)
+    return conditional_entry_response(request, entry, location)
 
 
 @router.get("/7d")
-async def get_7d(location: str = Query(min_length=1, description="和风城市ID")):
-    return await qweather.weather_7d(location)
+async def get_7d(request: Request, location: str = Query(min_length=1, description="和风城市ID")):
+    entry = await qweather.weather_entry("7d", location)
+    return conditional_entry_response(request, entry, location)
+
+
+def _snap_coordinates(lat: float, lon: float) -> str:
+    """坐标 -> 共享缓存的 location：附近有已知城市时用其和风ID，否则对齐到网格点（和风最多两位小数）"""
+    if settings.weather_coord_snap_km > 0:
+        found = gazetteer.nearest(lat, lon, settings.weather_coord_snap_km)
+        if found is not None:
+            return found[0]["id"]
+    grid = max(settings.weather_coord_grid, 0.01)
+    # + 0.0 把 -0.0 规整为 0.0，避免同一网格点出现两个缓存键
+    lat = round(round(lat / grid) * grid, 2) + 0.0
+    lon = round(round(lon / grid) * grid, 2) + 0.0
+    return f"{lon:.2f},{lat:.2f}"
+
+
+@router.get("/point")
+async def get_point(
+    request: Request,
+    lat: float = Query(ge=-90, le=90, description="纬度"),
+    lon: float = Query(ge=-180, le=180, description="经度"),
+    kind: WeatherKind = Query(default="now", description="数据类型：now / 24h / 7d"),
+):
+    """按坐标查询天气：先吸附到附近城市或网格点再查缓存，邻近用户共享同一缓存项"""
+    location = _snap_coordinates(lat, lon)
+    entry = await qweather.weather_entry(kind, location)
+    response = conditional_entry_response(request, entry, location)
+    # 告知前端实际使用的 location，后续可直接按城市ID请求
+    response.headers["X-Weather-Location"] = location
+    return response
+
+
+@router.get("/bundle")
+async def get_bundle(request: Request, location: str = Query(min_length=1, description="和风城市ID")):
+    """仪表盘一次性数据：实时 + 24小时 + 7天，服务端并发获取并裁剪为前端所需字段
+
+    各部分单独成败：请求失败或和风返回业务错误码的部分为空，并在 errors 中按 now / 24h / 7d 记录（与 /batch 相同）；
+    三部分都请求失败时按首个错误返回
+    """
+    kinds = ("now", "24h", "7d")
+    results = await asyncio.gather(
+        qweather.weather_now(location),
+        qweather.weather_24h(location),
+        qweather.weather_7d(location),
+        return_exceptions=True,
+    )
+    if all(isinstance(r, Exception) for r in results):
+        raise results[0]
+    parts = {}
+    errors = {}
+    for kind, result in zip(kinds, results):
+        error = qweather.exception_error(result) if isinstance(result, Exception) else qweather.business_error(result)
+        if error is None:
+            parts[kind] = result
+        else:
+            errors[kind] = error
+    now = parts.get("now") or {}
+    return negotiate(request, {
+        "current": {
+            "code": results[0].get("code") if isinstance(results[0], dict) else None,
+            "updateTime": now.get("updateTime"),
+            "now": now.get("now", {}),
+        },
+        "hourly": ((parts.get("24h") or {}).get("hourly") or [])[:24],
+        "daily": (parts.get("7d") or {}).get("daily") or [],
+        # 任一部分来自上游故障时的旧数据
+        "stale": any(part.get("stale") for part in parts.values()),
+        "errors": errors,
+    })
+
+
+@router.get("/metrics")
+async def get_metrics(
+    request: Request,
+    location: str = Query(min_length=1, description="和风城市ID"),
+    kind: Literal["24h", "7d"] = Query(default="24h", description="逐小时 24h 或逐日 7d"),
+):
+    """预报派生指标：露点、热指数、风寒、体感、舒适度、降水时段、最佳出门时段（随预报缓存）"""
+    entry = await qweather.weather_entry(kind, location)
+    metrics = entry.metrics
+    if metrics is None:
+        # 和风返回业务错误码时原样返回
+        return entry_response(request, entry)
+    return negotiate(request, {
+        "code": "200",
+        "updateTime": entry.update_time,
+        "location": location,
+        "kind": kind,
+        "metrics": metrics.to_dict(),
+    })
+
+
+@router.get("/compare")
+async def get_compare(
+    request: Request,
+    locations: List[str] = Query(..., description="和风城市ID，可重复传参或逗号分隔"),
+    day: int = Query(default=1, ge=0, le=6, description="第几天（0 为今天，1 为明天）"),
+    metric: CompareMetric = Query(default="temp_max", description="比较的逐日指标"),
+    order: Literal["desc", "asc"] = Query(default="desc", description="desc 取最大（如最暖），asc 取最小"),
+):
+    """跨城市比较（如“明天哪个城市最暖”）"""
+    try:
+        req = WeatherBatchRequest(locations=_split_values(locations), kinds=["7d"])
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    entries, errors = await qweather.daily_many(req.locations, settings.weather_batch_concurrency)
+    return negotiate(request, compare_summary(entries, errors, day, metric, descending=order == "desc"))
+
+
+@router.post("/batch")
+async def get_batch(request: Request, req: WeatherBatchRequest):
+    """批量获取多个城市的天气，单个城市失败记录在 errors 中"""
+    results, errors = await qweather.fetch_many(req.locations, req.kinds, settings.weather_batch_concurrency)
+    return negotiate(request, {"results": results, "errors": errors})
+
+
+def _split_values(values: List[str]) -> List[str]:
+    return [v.strip() for value in values for v in value.split(",") if v.strip()]
+
+
+def _stream_response(request: Request, req: WeatherBatchRequest, fmt: str | None) -> StreamingResponse:
+    """逐城市推送：NDJSON（默认）或 SSE（format=sse 或 Accept: text/event-stream）"""
+    sse = fmt == "sse" or (fmt is None and "text/event-stream" in request.headers.get("accept", ""))
+
+    async def events():
+        count = 0
+        async for location, data, errors in qweather.iter_many(req.locations, req.kinds, settings.weather_batch_concurrency):
+            count += 1
+            line = orjson.dumps({"location": location, "data": data, "errors": errors})
+            if sse:
+                yield b"event: city\ndata: " + line + b"\n\n"
+            else:
+                yield line + b"\n"
+        if sse:
+            yield b"event: done\ndata: " + orjson.dumps({"count": count}) + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        # 关闭代理缓冲，保证逐条送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stream")
+async def get_stream(
+    request: Request,
+    locations: List[str] = Query(..., description="和风城市ID，可重复传参或逗号分隔"),
+    kinds: List[str] = Query(default=["now"], description="数据类型：now / 24h / 7d"),
+    format: Literal["ndjson", "sse"] | None = Query(default=None, description="输出格式，默认按 Accept 判断"),
+):
+    """多城市流式天气：已缓存的城市先返回，其余城市数据就绪即推送一行（适合 EventSource）"""
+    try:
+        req = WeatherBatchRequest(locations=_split_values(locations), kinds=_split_values(kinds))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    return _stream_response(request, req, format)
+
+
+@router.post("/stream")
+async def post_stream(
+    request: Request,
+    req: WeatherBatchRequest,
+    format: Literal["ndjson", "sse"] | None = Query(default=None, description="输出格式，默认按 Accept 判断"),
+):
+    """同 GET /stream，城市列表放在请求体中（fetch + ReadableStream 读取）"""
+    return _stream_response(request, req, format)
+
+
+# 订阅连接的心跳间隔（秒）：SSE 发送注释行，便于及时发现断开的连接
+SUBSCRIBE_HEARTBEAT_SECONDS = 15
+
+
+@router.get("/subscribe")
+async def subscribe_sse(
+    locations: List[str] = Query(..., description="和风城市ID，可重复传参或逗号分隔"),
+):
+    """订阅实时天气（SSE）：先推送各城市快照（snapshot），之后只推送变化的字段（update）"""
+    locations = list(dict.fromkeys(_split_values(locations)))
+    # 先校验再开始响应：订阅在响应体开始发送时才建立，此后无法再返回 422
+    if len(locations) > MAX_LOCATIONS_PER_SUBSCRIBER:
+        raise HTTPException(status_code=422, detail=f"单个连接最多订阅 {MAX_LOCATIONS_PER_SUBSCRIBER} 个城市")
+
+    async def events():
+        # 在生成器内订阅：响应体未被迭代（客户端提前断开等）时不会留下订阅者与轮询任务
+        sub = weather_hub.connect()
+        try:
+            weather_hub.subscribe(sub, locations)
+            while True:
+                try:
+                    messages = await asyncio.wait_for(sub.next_messages(), timeout=SUBSCRIBE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if messages is None:
+                    # 消费过慢被断开，客户端（EventSource）会自动重连并重新获取快照
+                    yield b"event: close\ndata: {}\n\n"
+                    return
+                for message in messages:
+                    yield b"event: " + message["type"].encode() + b"\ndata: " + orjson.dumps(message) + b"\n\n"
+        finally:
+            weather_hub.disconnect(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _ws_send(websocket: WebSocket, sub: Subscriber) -> None:
+    while True:
+        messages = await sub.next_messages()
+        if messages is None:
+            await websocket.close(code=1013, reason="consumer too slow")
+            return
+        for message in messages:
+            await websocket.send_text(orjson.dumps(message).decode())
+
+
+async def _ws_receive(websocket: WebSocket, sub: Subscriber) -> None:
+    """客户端消息：{"action": "subscribe" | "unsubscribe", "locations": [...]}"""
+    while True:
+        try:
+            command = await websocket.receive_json()
+            action = command.get("action")
+            locations = [str(x) for x in command.get("locations", [])]
+            if action == "subscribe":
+                weather_hub.subscribe(sub, locations)
+            elif action == "unsubscribe":
+                weather_hub.unsubscribe(sub, locations)
+            else:
+                raise ValueError(f"未知操作: {action}")
+        except WebSocketDisconnect:
+            return
+        except HTTPException as e:
+            sub.offer({"type": "error", "message": e.detail})
+        except (ValueError, AttributeError, TypeError) as e:
+            sub.offer({"type": "error", "message": str(e)})
 
 
+@router.websocket("/ws")
+async def subscribe_ws(websocket: WebSocket, locations: str = ""):
+    """订阅实时天气（WebSocket）：连接参数 locations 为初始订阅，之后可发送订阅/取消订阅消息"""
+    await websocket.accept()
+    sub = weather_hub.connect()
+    try:
+        try:
+            weather_hub.subscribe(sub, _split_values([locations]))
+        except HTTPException as e:
+            sub.offer({"type": "error", "message": e.detail})
+        tasks = {asyncio.create_task(_ws_send(websocket, sub)), asyncio.create_task(_ws_receive(websocket, sub))}
+        _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        weather_hub.disconnect(sub)
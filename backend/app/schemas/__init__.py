@@ -3,6 +3,8 @@ from .auth import *
 from .user import *
 from .city import *
 from .weather import *
+from .geo import *
+from .astronomy import *
 
 __all__ = [
     # Auth schemas
@@ -26,5 +28,14 @@ __all__ = [
     
     # Weather schemas
     "WeatherCacheCreate",
-    "WeatherCacheResponse"
+    "WeatherCacheResponse",
+    "WeatherBatchRequest",
+    
+    # Geo schemas
+    "GeoPoint",
+    "ReverseGeocodeBatchRequest",
+
+    # Astronomy schemas
+    "AstronomyPoint",
+    "AstronomyBatchRequest",
 ]
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
+
+# 批量天文计算单次最多的城市数与天数（城市数 × 天数另受 astronomy.MAX_CITY_DAYS 限制）
+ASTRONOMY_BATCH_MAX_LOCATIONS = 200
+ASTRONOMY_MAX_DAYS = 366
+
+class AstronomyPoint(BaseModel):
+    """按坐标计算时的地点"""
+    lat: float = Field(..., ge=-90, le=90, description="纬度")
+    lon: float = Field(..., ge=-180, le=180, description="经度")
+    tz: Optional[str] = Field(default=None, description="IANA 时区名，默认 Asia/Shanghai")
+    name: Optional[str] = Field(default=None, description="显示名称")
+
+class AstronomyBatchRequest(BaseModel):
+    """批量天文计算：和风城市ID与坐标可混用；给出 year 时计算全年，否则从 start 起算 days 天"""
+    locations: List[str] = Field(default=[], max_length=ASTRONOMY_BATCH_MAX_LOCATIONS, description="和风城市ID列表")
+    points: List[AstronomyPoint] = Field(default=[], max_length=ASTRONOMY_BATCH_MAX_LOCATIONS, description="坐标列表")
+    year: Optional[int] = Field(default=None, ge=1900, le=2100, description="计算全年")
+    start: Optional[date] = Field(default=None, description="起始日期，默认今天")
+    days: int = Field(default=7, ge=1, le=ASTRONOMY_MAX_DAYS, description="天数（未给出 year 时生效）")
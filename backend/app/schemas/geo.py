@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+# 批量反向地理编码单次最多的坐标数
+REVERSE_BATCH_MAX_POINTS = 1000
+
+class GeoPoint(BaseModel):
+    """经纬度坐标（WGS84）"""
+    lat: float = Field(..., ge=-90, le=90, description="纬度")
+    lon: float = Field(..., ge=-180, le=180, description="经度")
+
+class ReverseGeocodeBatchRequest(BaseModel):
+    """批量反向地理编码请求"""
+    points: List[GeoPoint] = Field(..., min_length=1, max_length=REVERSE_BATCH_MAX_POINTS, description="坐标列表")
@@ -1,7 +1,14 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
+# 批量接口单次最多查询的城市数
+WEATHER_BATCH_MAX_LOCATIONS = 50
+
+WeatherKind = Literal['now', '24h', '7d']
+# 跨城市比较可用的逐日指标（与 weather_metrics.COMPARE_FIELDS 一致）
+CompareMetric = Literal['temp_max', 'temp_min', 'apparent_max', 'apparent_min', 'comfort', 'precip', 'humidity', 'uv_index']
+
 class WeatherCacheCreate(BaseModel):
     """天气缓存创建模型"""
     location_id: str
@@ -19,4 +26,10 @@ class WeatherCacheResponse(BaseModel):
     expires_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class WeatherBatchRequest(BaseModel):
+    """批量天气查询请求"""
+    locations: List[str] = Field(..., min_length=1, max_length=WEATHER_BATCH_MAX_LOCATIONS, description="和风城市ID列表")
+    kinds: List[WeatherKind] = Field(default=['now'], min_length=1, description="数据类型：now / 24h / 7d")
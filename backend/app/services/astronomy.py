@@ -0,0 +1,190 @@
+"""本地天文计算（NumPy 向量化）
+
+日出/日落/昼长/正午与月相都只取决于坐标与日期，不必占用和风配额与网络延迟：
+- 太阳：NOAA 太阳位置算法（赤纬、均时差），日出日落按太阳中心位于地平线下 0.833°（含大气折射与视半径）
+- 月相：Meeus 低精度公式（日月距角及主要周期项）求相位角与照明比例，误差在数小时以内
+
+所有量按 [城市, 日期] 矩阵一次性计算，支持多城市全年批量。
+极昼/极夜时日出日落为 None，昼长为 24 小时或 0。
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+DEFAULT_TZ = "Asia/Shanghai"
+# 和风月相名称与图标代码（800 新月 ~ 807 残月）
+MOON_PHASES = ("新月", "蛾眉月", "上弦月", "盈凸月", "满月", "亏凸月", "下弦月", "残月")
+# 批量接口单次最多的 城市数 × 天数
+MAX_CITY_DAYS = 100 * 366
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+_SUNRISE_ZENITH = np.radians(90.833)
+
+
+def date_range(start: date, days: int) -> List[date]:
+	return [start + timedelta(days=i) for i in range(days)]
+
+
+def year_dates(year: int) -> List[date]:
+	start = date(year, 1, 1)
+	return date_range(start, (date(year + 1, 1, 1) - start).days)
+
+
+@lru_cache(maxsize=256)
+def _offsets_for(tz: str, first: date, days: int) -> np.ndarray:
+	try:
+		zone = ZoneInfo(tz)
+	except (ZoneInfoNotFoundError, ValueError):
+		zone = ZoneInfo(DEFAULT_TZ)
+	return np.array([
+		datetime(d.year, d.month, d.day, 12, tzinfo=zone).utcoffset().total_seconds() / 3600
+		for d in date_range(first, days)
+	])
+
+
+def utc_offsets(tzs: Sequence[Optional[str]], dates: Sequence[date]) -> np.ndarray:
+	"""各城市各日的 UTC 偏移（小时），形状 [城市, 日期]；按时区名计算并缓存，含夏令时"""
+	dates = list(dates)
+	contiguous = all((b - a).days == 1 for a, b in zip(dates, dates[1:]))
+	rows = []
+	for tz in tzs:
+		if contiguous and dates:
+			rows.append(_offsets_for(tz or DEFAULT_TZ, dates[0], len(dates)))
+		else:
+			rows.append(np.array([_offsets_for(tz or DEFAULT_TZ, d, 1)[0] for d in dates]))
+	return np.vstack(rows) if rows else np.empty((0, len(dates)))
+
+
+def _julian_days(dates: Sequence[date]) -> np.ndarray:
+	"""各日期 0h UTC 的儒略日"""
+	ordinals = np.array([d.toordinal() for d in dates], dtype=np.float64)
+	return ordinals - date(1970, 1, 1).toordinal() + _UNIX_EPOCH_JD
+
+
+class AstronomyTable:
+	"""[城市, 日期] 矩阵形式的计算结果；时刻为当地时间自零点起的分钟数（float，极昼/极夜为 nan）"""
+	__slots__ = ("dates", "sunrise", "sunset", "solar_noon", "day_length", "moon_phase", "moon_illumination")
+
+	def __init__(self, dates, sunrise, sunset, solar_noon, day_length, moon_phase, moon_illumination):
+		self.dates = dates
+		self.sunrise = sunrise
+		self.sunset = sunset
+		self.solar_noon = solar_noon
+		self.day_length = day_length
+		self.moon_phase = moon_phase
+		self.moon_illumination = moon_illumination
+
+	@property
+	def shape(self):
+		return self.sunrise.shape
+
+	def columns(self, i: int) -> Dict[str, Any]:
+		"""第 i 个城市的列式结果（批量接口使用，体积小）"""
+		phase_index = _phase_index(self.moon_phase[i])
+		return {
+			"dates": [d.isoformat() for d in self.dates],
+			"sunrise": _clock(self.sunrise[i]),
+			"sunset": _clock(self.sunset[i]),
+			"solarNoon": _clock(self.solar_noon[i]),
+			"dayLength": [int(round(v)) for v in self.day_length[i]],
+			"moonPhase": [MOON_PHASES[k] for k in phase_index],
+			"moonPhaseIcon": [str(800 + k) for k in phase_index],
+			"moonIllumination": [int(round(v)) for v in self.moon_illumination[i] * 100],
+		}
+
+	def daily(self, i: int) -> List[Dict[str, Any]]:
+		"""第 i 个城市的逐日结果（字段名与和风逐日预报一致，dayLength 为分钟）"""
+		cols = self.columns(i)
+		return [
+			{
+				"fxDate": cols["dates"][j],
+				"sunrise": cols["sunrise"][j],
+				"sunset": cols["sunset"][j],
+				"solarNoon": cols["solarNoon"][j],
+				"dayLength": cols["dayLength"][j],
+				"moonPhase": cols["moonPhase"][j],
+				"moonPhaseIcon": cols["moonPhaseIcon"][j],
+				"moonIllumination": cols["moonIllumination"][j],
+			}
+			for j in range(len(self.dates))
+		]
+
+
+def _clock(minutes: np.ndarray) -> List[Optional[str]]:
+	out = []
+	for v in minutes:
+		if np.isnan(v):
+			out.append(None)
+		else:
+			m = int(round(v)) % 1440
+			out.append(f"{m // 60:02d}:{m % 60:02d}")
+	return out
+
+
+def _phase_index(phase: np.ndarray) -> np.ndarray:
+	# 相位 0 新月、0.25 上弦、0.5 满月、0.75 下弦；按 8 个区间取最近的名称
+	return (np.floor(phase * 8 + 0.5).astype(np.int64)) % 8
+
+
+def compute(
+	lats: Sequence[float], lons: Sequence[float], dates: Sequence[date], offsets: Optional[np.ndarray] = None,
+) -> AstronomyTable:
+	"""批量计算 len(lats) 个城市在 dates 各日的太阳与月相；offsets 为 [城市, 日期] 的 UTC 偏移（小时），默认 +8"""
+	dates = list(dates)
+	lat = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+	lon = np.asarray(lons, dtype=np.float64)[:, None]
+	tz = np.full((len(lat), len(dates)), 8.0) if offsets is None else np.asarray(offsets, dtype=np.float64)
+
+	# 以当地正午对应的时刻计算太阳参数
+	jd = _julian_days(dates)[None, :] + 0.5 - tz / 24.0
+	t = (jd - _J2000) / 36525.0
+	mean_long = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+	mean_anom = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+	ecc = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+	center = np.radians(
+		np.sin(mean_anom) * (1.914602 - t * (0.004817 + 0.000014 * t))
+		+ np.sin(2 * mean_anom) * (0.019993 - 0.000101 * t)
+		+ np.sin(3 * mean_anom) * 0.000289
+	)
+	omega = np.radians(125.04 - 1934.136 * t)
+	app_long = mean_long + center - np.radians(0.00569 + 0.00478 * np.sin(omega))
+	mean_obliq = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+	obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+	decl = np.arcsin(np.sin(obliq) * np.sin(app_long))
+	y = np.tan(obliq / 2) ** 2
+	eq_time = 4 * np.degrees(
+		y * np.sin(2 * mean_long) - 2 * ecc * np.sin(mean_anom)
+		+ 4 * ecc * y * np.sin(mean_anom) * np.cos(2 * mean_long)
+		- 0.5 * y * y * np.sin(4 * mean_long) - 1.25 * ecc * ecc * np.sin(2 * mean_anom)
+	)
+
+	cos_ha = np.cos(_SUNRISE_ZENITH) / (np.cos(lat) * np.cos(decl)) - np.tan(lat) * np.tan(decl)
+	ha_minutes = 4 * np.degrees(np.arccos(np.clip(cos_ha, -1.0, 1.0)))
+	solar_noon = 720 - 4 * lon - eq_time + tz * 60
+	# cos_ha > 1 极夜，< -1 极昼：没有日出日落
+	polar = (cos_ha > 1) | (cos_ha < -1)
+	sunrise = np.where(polar, np.nan, solar_noon - ha_minutes)
+	sunset = np.where(polar, np.nan, solar_noon + ha_minutes)
+	day_length = np.where(cos_ha > 1, 0.0, np.where(cos_ha < -1, 1440.0, 2 * ha_minutes))
+
+	# 月相：相位角 i（Meeus 48.4），照明比例 (1 + cos i) / 2；相位按日月距角 0~1
+	d = np.radians((297.8501921 + 445267.1114034 * t) % 360)
+	m = np.radians((357.5291092 + 35999.0502909 * t) % 360)
+	mp = np.radians((134.9633964 + 477198.8675055 * t) % 360)
+	phase_angle = np.radians(
+		180 - np.degrees(d) - 6.289 * np.sin(mp) + 2.100 * np.sin(m) - 1.274 * np.sin(2 * d - mp)
+		- 0.658 * np.sin(2 * d) - 0.214 * np.sin(2 * mp) - 0.110 * np.sin(d)
+	)
+	illumination = (1 + np.cos(phase_angle)) / 2
+	moon_phase = ((np.pi - phase_angle) / (2 * np.pi)) % 1.0
+
+	return AstronomyTable(dates, sunrise, sunset, solar_noon, day_length, moon_phase, illumination)
+
+
+def for_location(lat: float, lon: float, dates: Sequence[date], tz: Optional[str] = None) -> AstronomyTable:
+	"""单个城市的便捷入口（表内只有第 0 行）"""
+	return compute([lat], [lon], dates, utc_offsets([tz], dates))
@@ -0,0 +1,396 @@
+"""qweather 一级缓存后端
+
+三种实现共享同一缓存键与过期语义（条目在 hard_expires 之后不可见）：
+- memory：进程内 TLRUCache，单 worker 部署
+- mmap：同机多 worker 共享的内存映射文件（定长槽位哈希表，Unix）
+- redis：Redis 协议服务（Redis / KeyDB / Dragonfly 等），跨主机共享
+"""
+import os
+import re
+import sys
+import time
+import struct
+import hashlib
+import tempfile
+from typing import Any, Dict, Optional
+
+import orjson
+from cachetools import TLRUCache
+
+from app.services.weather_records import WeatherRecord, parse_record
+from app.services.weather_metrics import WeatherMetrics, compute_metrics
+
+
+_UPDATE_TIME_RE = re.compile(rb'"updateTime"\s*:\s*"([^"]*)"')
+_CODE_RE = re.compile(rb'"code"\s*:\s*"([^"]*)"')
+
+
+class CacheEntry:
+	"""缓存条目：保存上游原始响应体 raw，data 为按需解析的视图，record 为紧凑的数值表示，metrics 为派生指标
+
+	路由直接把 raw 写入响应（不做解析/序列化）；有 raw 的条目每次读取 data 都重新解析、不常驻内存，
+	内部调用方优先使用 record（解析一次后随条目缓存）。
+	仅有 data 的条目（如降级时附加了 stale 标记）在首次读取 raw 时序列化。
+	"""
+	__slots__ = ("_raw", "_data", "_record", "_metrics", "kind", "fetched_at", "soft_expires", "hard_expires")
+
+	def __init__(self, data: Optional[Dict[str, Any]], kind: str, fetched_at: float, soft_expires: float,
+				 hard_expires: float, raw: Optional[bytes] = None):
+		if data is None and raw is None:
+			raise ValueError("CacheEntry 需要 data 或 raw")
+		# 同时给出 raw 时只保留 raw，解析结果不随条目常驻
+		self._data = data if raw is None else None
+		self._raw = raw
+		self._record: Optional[WeatherRecord] | bool = False
+		self._metrics: Optional[WeatherMetrics] | bool = False
+		self.kind = kind
+		self.fetched_at = fetched_at
+		self.soft_expires = soft_expires
+		self.hard_expires = hard_expires
+
+	@property
+	def data(self) -> Dict[str, Any]:
+		if self._data is None:
+			return orjson.loads(self._raw)
+		return self._data
+
+	@property
+	def record(self) -> Optional[WeatherRecord]:
+		"""now / 24h / 7d / 3d 的紧凑表示（城市搜索与错误响应为 None）"""
+		if self._record is False:
+			self._record = parse_record(self.kind, self.data)
+		return self._record
+
+	@property
+	def metrics(self) -> Optional[WeatherMetrics]:
+		"""24h / 7d / 3d 的派生指标（露点、体感、舒适度等），计算一次后随条目缓存"""
+		if self._metrics is False:
+			self._metrics = compute_metrics(self.record)
+		return self._metrics
+
+	def nbytes(self) -> int:
+		"""条目的近似内存占用（原文 + 紧凑记录 + 派生指标 + 自身），用于按字节淘汰与内存统计"""
+		size = sys.getsizeof(self) + sys.getsizeof(self.kind)
+		if self._raw is not None:
+			size += sys.getsizeof(self._raw)
+		if self._record:
+			size += self._record.nbytes()
+		if self._metrics:
+			size += self._metrics.nbytes()
+		return size
+
+	@property
+	def raw(self) -> bytes:
+		if self._raw is None:
+			self._raw = orjson.dumps(self._data)
+		return self._raw
+
+	@property
+	def update_time(self) -> Optional[str]:
+		"""上游 updateTime 原文；有 raw 时直接在原文中查找，生成 ETag 无需解析整个响应"""
+		if self._data is not None:
+			return self._data.get("updateTime") if isinstance(self._data, dict) else None
+		match = _UPDATE_TIME_RE.search(self._raw)
+		return match.group(1).decode("utf-8") if match else None
+
+	@property
+	def ok(self) -> bool:
+		"""和风业务码是否为 "200"；有 raw 时在原文中查找，无需解析"""
+		if self._data is not None:
+			return isinstance(self._data, dict) and self._data.get("code") == "200"
+		match = _CODE_RE.search(self._raw)
+		return match is not None and match.group(1) == b"200"
+
+	@property
+	def stale(self) -> bool:
+		"""上游故障时降级返回的旧数据（带 stale 标记，不写入缓存）"""
+		return self._data is not None and isinstance(self._data, dict) and self._data.get("stale") is True
+
+	# 序列化格式：定长头（时间戳 + kind 长度）+ kind + 原始 JSON
+	_HEADER = struct.Struct("<dddH")
+
+	def to_bytes(self) -> bytes:
+		kind = self.kind.encode("utf-8")
+		return self._HEADER.pack(self.fetched_at, self.soft_expires, self.hard_expires, len(kind)) + kind + self.raw
+
+	@classmethod
+	def from_bytes(cls, raw: bytes) -> "CacheEntry":
+		fetched_at, soft, hard, kind_len = cls._HEADER.unpack_from(raw)
+		offset = cls._HEADER.size
+		kind = raw[offset:offset + kind_len].decode("utf-8")
+		return cls(None, kind, fetched_at, soft, hard, raw=raw[offset + kind_len:])
+
+
+class CacheBackend:
+	"""缓存后端接口"""
+	name = "base"
+
+	async def get(self, key: str) -> Optional[CacheEntry]:
+		raise NotImplementedError
+
+	async def set(self, key: str, entry: CacheEntry) -> None:
+		raise NotImplementedError
+
+	async def delete(self, key: str) -> None:
+		raise NotImplementedError
+
+	async def clear(self) -> None:
+		raise NotImplementedError
+
+	async def close(self) -> None:
+		pass
+
+	def stats(self) -> Dict[str, Any]:
+		return {"backend": self.name}
+
+	def memory_report(self, limit: int = 20) -> Optional[Dict[str, Any]]:
+		"""进程内条目的内存明细；共享后端的数据不在本进程内存中，返回 None"""
+		return None
+
+
+class MemoryCacheBackend(CacheBackend):
+	"""进程内缓存；max_bytes > 0 时按条目字节数（CacheEntry.nbytes）淘汰，否则按条目数 maxsize 淘汰"""
+	name = "memory"
+
+	def __init__(self, maxsize: int = 1024, max_bytes: int = 0):
+		self._max_bytes = max_bytes
+		# 每个条目按自身硬过期时间淘汰；按字节预算时 maxsize 为字节数
+		self._cache: TLRUCache[str, CacheEntry] = TLRUCache(
+			maxsize=max_bytes if max_bytes > 0 else maxsize,
+			ttu=lambda _key, entry, _now: entry.hard_expires,
+			timer=time.time,
+			getsizeof=(lambda entry: entry.nbytes()) if max_bytes > 0 else None,
+		)
+		self.too_large = 0
+
+	async def get(self, key: str) -> Optional[CacheEntry]:
+		return self._cache.get(key)
+
+	async def set(self, key: str, entry: CacheEntry) -> None:
+		# 先生成紧凑记录与派生指标：写入时计算的字节数即为常驻大小
+		_ = entry.metrics
+		try:
+			self._cache[key] = entry
+		except ValueError:
+			# 单个条目超过整个预算，不缓存
+			self.too_large += 1
+
+	async def delete(self, key: str) -> None:
+		self._cache.pop(key, None)
+
+	async def clear(self) -> None:
+		self._cache.clear()
+
+	def memory_report(self, limit: int = 20) -> Dict[str, Any]:
+		"""按数据类型汇总的内存占用，以及占用最大的若干条目"""
+		by_kind: Dict[str, Dict[str, int]] = {}
+		entries = []
+		total = 0
+		for key, entry in list(self._cache.items()):
+			size = entry.nbytes()
+			total += size
+			kind = by_kind.setdefault(entry.kind, {"entries": 0, "bytes": 0})
+			kind["entries"] += 1
+			kind["bytes"] += size
+			entries.append((size, key, entry))
+		entries.sort(key=lambda x: x[0], reverse=True)
+		return {
+			"bytes": total,
+			"max_bytes": self._max_bytes or None,
+			"by_kind": by_kind,
+			"largest": [
+				{
+					"key": key,
+					"kind": entry.kind,
+					"bytes": size,
+					"raw_bytes": len(entry.raw),
+					"record_bytes": entry.record.nbytes() if entry.record else 0,
+					"metrics_bytes": entry.metrics.nbytes() if entry.metrics else 0,
+				}
+				for size, key, entry in entries[:limit]
+			],
+		}
+
+	def stats(self) -> Dict[str, Any]:
+		stats = {"backend": self.name, "size": len(self._cache), "too_large": self.too_large}
+		if self._max_bytes > 0:
+			stats["bytes"] = self._cache.currsize
+			stats["max_bytes"] = self._max_bytes
+		return stats
+
+
+def _stable_hash(key: str) -> int:
+	# 进程间一致的 64 位哈希（内置 hash() 每个进程随机化）
+	return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MmapCacheBackend(CacheBackend):
+	"""同机多进程共享的定长槽位哈希表
+
+	文件由 slots 个 slot_size 字节的槽位组成，槽位布局：
+	[key_hash u64][hard_expires f64][key_len u16][payload_len u32][key][payload]
+	- 开放寻址，最多探测 PROBES 个槽位；满时覆盖最早过期的槽位
+	- 读写按槽位加 fcntl 记录锁（读共享 / 写独占），锁粒度为单个槽位
+	- 超出槽位大小的条目不进入共享缓存
+	"""
+	name = "mmap"
+	PROBES = 4
+	_SLOT_HEADER = struct.Struct("<QdHI")
+
+	def __init__(self, path: str | None = None, slots: int = 2048, slot_size: int = 16384):
+		import fcntl
+		import mmap
+		self._fcntl = fcntl
+		self._path = path or os.path.join(tempfile.gettempdir(), "weatherwhisper-qweather.cache")
+		self._slots = slots
+		self._slot_size = slot_size
+		size = slots * slot_size
+		self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+		# 多个 worker 同时启动时，仅由一个进程初始化文件大小
+		fcntl.flock(self._fd, fcntl.LOCK_EX)
+		try:
+			if os.fstat(self._fd).st_size != size:
+				os.ftruncate(self._fd, 0)
+				os.ftruncate(self._fd, size)
+		finally:
+			fcntl.flock(self._fd, fcntl.LOCK_UN)
+		self._mm = mmap.mmap(self._fd, size)
+
+	def _probe(self, key_hash: int):
+		first = key_hash % self._slots
+		return [((first + i) % self._slots) * self._slot_size for i in range(self.PROBES)]
+
+	def _lock(self, offset: int, exclusive: bool):
+		cmd = self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH
+		self._fcntl.lockf(self._fd, cmd, self._slot_size, offset, os.SEEK_SET)
+
+	def _unlock(self, offset: int):
+		self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, self._slot_size, offset, os.SEEK_SET)
+
+	async def get(self, key: str) -> Optional[CacheEntry]:
+		key_hash = _stable_hash(key)
+		key_bytes = key.encode("utf-8")
+		now = time.time()
+		for offset in self._probe(key_hash):
+			self._lock(offset, exclusive=False)
+			try:
+				slot_hash, hard, key_len, payload_len = self._SLOT_HEADER.unpack_from(self._mm, offset)
+				if slot_hash != key_hash or hard <= now:
+					continue
+				start = offset + self._SLOT_HEADER.size
+				if self._mm[start:start + key_len] != key_bytes:
+					continue
+				payload = self._mm[start + key_len:start + key_len + payload_len]
+			finally:
+				self._unlock(offset)
+			return CacheEntry.from_bytes(payload)
+		return None
+
+	async def set(self, key: str, entry: CacheEntry) -> None:
+		key_hash = _stable_hash(key)
+		key_bytes = key.encode("utf-8")
+		payload = entry.to_bytes()
+		if self._SLOT_HEADER.size + len(key_bytes) + len(payload) > self._slot_size:
+			return
+		now = time.time()
+		# 选择槽位：同 key > 空/已过期 > 最早过期（无锁读取头部，仅作启发式选择）
+		target, target_expires = None, None
+		for offset in self._probe(key_hash):
+			slot_hash, hard, _, _ = self._SLOT_HEADER.unpack_from(self._mm, offset)
+			if slot_hash == key_hash:
+				target = offset
+				break
+			if hard <= now:
+				target, target_expires = offset, float("-inf")
+			elif target_expires is None or hard < target_expires:
+				target, target_expires = offset, hard
+		self._lock(target, exclusive=True)
+		try:
+			header = self._SLOT_HEADER.pack(key_hash, entry.hard_expires, len(key_bytes), len(payload))
+			start = target + self._SLOT_HEADER.size
+			self._mm[target:start] = header
+			self._mm[start:start + len(key_bytes) + len(payload)] = key_bytes + payload
+		finally:
+			self._unlock(target)
+
+	async def delete(self, key: str) -> None:
+		key_hash = _stable_hash(key)
+		for offset in self._probe(key_hash):
+			self._lock(offset, exclusive=True)
+			try:
+				slot_hash, _, _, _ = self._SLOT_HEADER.unpack_from(self._mm, offset)
+				if slot_hash == key_hash:
+					self._mm[offset:offset + self._SLOT_HEADER.size] = bytes(self._SLOT_HEADER.size)
+			finally:
+				self._unlock(offset)
+
+	async def clear(self) -> None:
+		self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+		try:
+			self._mm[:] = bytes(len(self._mm))
+		finally:
+			self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+	async def close(self) -> None:
+		self._mm.close()
+		os.close(self._fd)
+
+	def stats(self) -> Dict[str, Any]:
+		now = time.time()
+		live = 0
+		for i in range(self._slots):
+			_, hard, _, _ = self._SLOT_HEADER.unpack_from(self._mm, i * self._slot_size)
+			if hard > now:
+				live += 1
+		return {"backend": self.name, "size": live, "slots": self._slots, "path": self._path}
+
+
+class RedisCacheBackend(CacheBackend):
+	"""Redis 协议后端，值为 CacheEntry.to_bytes()，以 PX 设置到硬过期的剩余毫秒数"""
+	name = "redis"
+
+	def __init__(self, url: str, prefix: str = "ww:qweather:"):
+		try:
+			import redis.asyncio as redis_asyncio
+		except ImportError as e:
+			raise RuntimeError("QWEATHER_CACHE_BACKEND=redis 需要安装 redis（pip install redis）") from e
+		self._redis = redis_asyncio.from_url(url)
+		self._prefix = prefix
+
+	async def get(self, key: str) -> Optional[CacheEntry]:
+		raw = await self._redis.get(self._prefix + key)
+		if raw is None:
+			return None
+		entry = CacheEntry.from_bytes(raw)
+		return entry if entry.hard_expires > time.time() else None
+
+	async def set(self, key: str, entry: CacheEntry) -> None:
+		ttl_ms = int((entry.hard_expires - time.time()) * 1000)
+		if ttl_ms <= 0:
+			return
+		await self._redis.set(self._prefix + key, entry.to_bytes(), px=ttl_ms)
+
+	async def delete(self, key: str) -> None:
+		await self._redis.delete(self._prefix + key)
+
+	async def clear(self) -> None:
+		async for k in self._redis.scan_iter(match=self._prefix + "*"):
+			await self._redis.delete(k)
+
+	async def close(self) -> None:
+		await self._redis.aclose()
+
+
+def build_cache_backend(kind: str, **options) -> CacheBackend:
+	"""按配置名称创建后端：memory / mmap / redis"""
+	if kind == "memory":
+		return MemoryCacheBackend(maxsize=options.get("maxsize", 1024), max_bytes=options.get("max_bytes", 0))
+	if kind == "mmap":
+		return MmapCacheBackend(
+			path=options.get("path") or None,
+			slots=options.get("slots", 2048),
+			slot_size=options.get("slot_size", 16384),
+		)
+	if kind == "redis":
+		return RedisCacheBackend(options.get("url", "redis://localhost:6379/0"))
+	raise ValueError(f"未知的缓存后端: {kind}")
@@ -1,10 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+import logging
 
+from cachetools import LRUCache
+
+from app.database.connection import AsyncSessionLocal
 from app.database.models.city import City
 from app.database.models.user_favorite import UserFavorite
+from app.services import qweather, gazetteer
+
+logger = logging.getLogger(__name__)
+
+# (城市名, 省份) -> 和风 location id；请求路径优先查此映射，避免每次查库或请求和风
+_location_ids: LRUCache = LRUCache(maxsize=10000)
+# 和风 location id -> {"id", "name", "lat", "lon", "tz"}（本地天文计算使用）
+_locations: LRUCache = LRUCache(maxsize=10000)
 
 
 class CityService:
@@ -116,5 +128,131 @@ class CityService:
         )
         return result.scalars().all()
 
+    
+    async def get_favorite_city_counts(self, db: AsyncSession, limit: int = 100) -> List[Tuple[str, Optional[str], int]]:
+        """按收藏人数统计城市（城市名, 省份, 收藏数）"""
+        result = await db.execute(
+            select(UserFavorite.city_name, UserFavorite.province, func.count(UserFavorite.id).label("cnt"))
+            .group_by(UserFavorite.city_name, UserFavorite.province)
+            .order_by(func.count(UserFavorite.id).desc())
+            .limit(limit)
+        )
+        return [(row.city_name, row.province, row.cnt) for row in result.all()]
+    
+    @staticmethod
+    def _match_location(locs: List[Dict[str, Any]], city_name: str, province: Optional[str]) -> Optional[Dict[str, Any]]:
+        """同名城市中匹配省份（按规范化名称比较，“浙江省”与“浙江”视为相同）
+
+        给出省份但没有同省的候选时返回 None，而不是猜测其中一个同名区县
+        """
+        named = [x for x in locs if x.get("name") == city_name]
+        if not province:
+            return named[0] if named else None
+        wanted = gazetteer.normalize(province)
+        return next((x for x in named if gazetteer.normalize(x.get("adm1") or "") == wanted), None)
+
+    @staticmethod
+    def _city_query(city_name: str, province: Optional[str]):
+        query = select(City).where(City.city_name == city_name)
+        return query.where(City.province.is_(None) if province is None else City.province == province)
+
+    async def _get_resolved_city(self, db: AsyncSession, city_name: str, province: Optional[str]) -> Optional[City]:
+        query = self._city_query(city_name, province).where(City.location_id.is_not(None))
+        result = await db.execute(query.limit(1))
+        return result.scalar_one_or_none()
+
+    async def _save_location(self, city_name: str, province: Optional[str], loc: Dict[str, Any]) -> None:
+        """把解析结果写回 cities 表（没有记录时新建，搜索次数记为 0，不影响热门排序）
+
+        使用独立会话提交，不会连带提交调用方会话中尚未提交的修改
+        """
+        async with AsyncSessionLocal() as db:
+            await self._apply_location(db, city_name, province, loc)
+            await db.commit()
+
+    async def _apply_location(self, db: AsyncSession, city_name: str, province: Optional[str], loc: Dict[str, Any]) -> None:
+        city = (await db.execute(self._city_query(city_name, province).limit(1))).scalar_one_or_none()
+        if city is None:
+            city = City(city_name=city_name, province=province, search_count=0, last_searched_at=datetime.utcnow())
+            db.add(city)
+        city.location_id = loc.get("id")
+        city.adm1 = loc.get("adm1") or None
+        city.adm2 = loc.get("adm2") or None
+        if loc.get("country"):
+            city.country = loc["country"]
+        try:
+            city.latitude = float(loc["lat"])
+            city.longitude = float(loc["lon"])
+        except (KeyError, TypeError, ValueError):
+            pass
+        city.location_resolved_at = datetime.utcnow()
+
+    async def resolve_location_id(self, db: AsyncSession, city_name: str, province: Optional[str]) -> Optional[str]:
+        """解析城市的和风 location id：进程内映射 -> cities 表 -> 本地城市索引 -> 和风城市查询
+
+        新解析的结果写回 cities 表，只有从未解析过的城市才会请求和风。
+        """
+        key = (city_name, province)
+        location_id = _location_ids.get(key)
+        if location_id:
+            return location_id
+
+        city = await self._get_resolved_city(db, city_name, province)
+        if city is not None:
+            _location_ids[key] = city.location_id
+            return city.location_id
+
+        loc = self._match_location(gazetteer.search(city_name, limit=20), city_name, province)
+        if loc is None:
+            query = f"{province or ''} {city_name}".strip()
+            data = await qweather.search_city(query)
+            locs = data.get("location", []) if isinstance(data, dict) else []
+            if not locs:
+                return None
+            loc = self._match_location(locs, city_name, province) or locs[0]
+        if not loc.get("id"):
+            return None
+        try:
+            await self._save_location(city_name, province, loc)
+        except Exception as e:
+            # 写库失败不影响本次解析结果
+            logger.warning("保存城市 %s/%s 的和风ID失败: %s", province, city_name, e)
+        _location_ids[key] = loc["id"]
+        return loc["id"]
+
+    async def get_location(self, db: Optional[AsyncSession], location_id: str) -> Optional[Dict[str, Any]]:
+        """按和风 location id 取坐标与时区：进程内映射 -> 本地城市索引 -> cities 表（db 为 None 时跳过）-> 和风城市查询"""
+        loc = _locations.get(location_id)
+        if loc is not None:
+            return loc
+
+        found = gazetteer.lookup_id(location_id)
+        if found is None and db is not None:
+            result = await db.execute(
+                select(City).where(City.location_id == location_id, City.latitude.is_not(None)).limit(1)
+            )
+            city = result.scalar_one_or_none()
+            if city is not None:
+                # cities 表未保存时区，国内城市按 Asia/Shanghai
+                found = {"id": location_id, "name": city.city_name, "lat": city.latitude, "lon": city.longitude, "tz": None}
+        if found is None:
+            data = await qweather.search_city(location_id)
+            locs = data.get("location", []) if isinstance(data, dict) else []
+            found = next((x for x in locs if x.get("id") == location_id), None)
+        if found is None:
+            return None
+        try:
+            loc = {
+                "id": location_id,
+                "name": found.get("name"),
+                "lat": float(found["lat"]),
+                "lon": float(found["lon"]),
+                "tz": found.get("tz") or None,
+            }
+        except (KeyError, TypeError, ValueError):
+            return None
+        _locations[location_id] = loc
+        return loc
+
 
 city_service = CityService()
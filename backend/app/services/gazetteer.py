@@ -0,0 +1,470 @@
+"""本地城市库（gazetteer）
+
+由和风天气公开的城市列表 CSV（China-City-List）构建紧凑的二进制索引，启动时以 mmap 只读加载，
+多个 worker 共享同一份页缓存。/api/geo 优先由本地索引回答，未命中再请求和风。
+
+索引文件布局（小端）：
+- 头部：magic、版本、地点数、检索键数、各区段偏移
+- 地点表：定长记录 [lat f64][lon f64][7 个字符串偏移 u32]（id、中文名、英文名、adm1、adm2、国家、时区）
+- 检索键表：按 UTF-8 字节序排序的定长记录 [键字符串偏移 u32][地点下标 u32][键类型 u8]
+- 字符串区：[长度 u16][UTF-8 字节]，相同字符串只存一份
+
+检索键：中文名、拼音全拼、拼音首字母（构建时需要 pypinyin，多音字索引各读音组合）、
+adm2 + 名称、adm1 + 名称（便于按“城市/省份 + 区县”前缀检索）。
+返回的 rank 按行政级别估算（省级/地级/区县），与和风结果一样供前端排序。
+"""
+import os
+import csv
+import math
+import mmap
+import struct
+import logging
+from itertools import islice, product
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[2] / "gazetteer" / "locations.idx"
+
+MAGIC = b"WWGZ"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIQQQ")
+_PLACE = struct.Struct("<dd7I")
+_KEY = struct.Struct("<IIB3x")
+_STR_LEN = struct.Struct("<H")
+
+# 检索键类型，数值越小排序越靠前
+KEY_NAME = 0
+KEY_PINYIN = 1
+KEY_INITIALS = 2
+KEY_ADM2_NAME = 3
+KEY_ADM1_NAME = 4
+
+# 反向地理编码网格：经纬度按 GRID_DEGREES 分格，查询只检查目标格及外圈若干格
+GRID_DEGREES = 0.25
+MAX_REVERSE_KM = 100.0
+_EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * _EARTH_RADIUS_KM / 180
+
+# 本地结果的 rank（与和风一致，数值越小越重要）：省级/直辖市、地级市、区县
+RANK_ADM1 = "10"
+RANK_ADM2 = "20"
+RANK_COUNTY = "30"
+
+# 多音字地名最多索引的读音组合数
+MAX_PINYIN_VARIANTS = 8
+
+# 前缀检索最多扫描的键数（单字查询可能命中大量地点）
+MAX_PREFIX_SCAN = 2000
+_NAME_SUFFIXES = ("特别行政区", "自治州", "自治县", "地区", "省", "市", "区", "县", "盟", "旗")
+
+
+class Place(NamedTuple):
+	id: str
+	name: str
+	name_en: str
+	adm1: str
+	adm2: str
+	country: str
+	tz: str
+	lat: float
+	lon: float
+
+
+def normalize(text: str) -> str:
+	"""检索键与查询统一规范化：小写、去空白与连字符，去掉行政区划后缀（“北京市” -> “北京”）"""
+	text = "".join(ch for ch in text.strip().lower() if not ch.isspace() and ch not in "-'·")
+	for suffix in _NAME_SUFFIXES:
+		if len(text) > len(suffix) + 1 and text.endswith(suffix):
+			return text[:-len(suffix)]
+	return text
+
+
+def _is_cjk(text: str) -> bool:
+	return any("一" <= ch <= "鿿" for ch in text)
+
+
+def read_location_csv(path: str | os.PathLike) -> List[Place]:
+	"""读取和风城市列表 CSV（首行可能是版本说明，从包含 Location_ID 的表头开始解析）"""
+	places: List[Place] = []
+	with open(path, newline="", encoding="utf-8-sig") as f:
+		reader = csv.reader(f)
+		header: Optional[List[str]] = None
+		for row in reader:
+			if header is None:
+				if "Location_ID" in row:
+					header = row
+				continue
+			if len(row) < len(header):
+				continue
+			rec = dict(zip(header, row))
+			try:
+				lat, lon = float(rec["Latitude"]), float(rec["Longitude"])
+			except (KeyError, ValueError):
+				continue
+			places.append(Place(
+				id=rec["Location_ID"].strip(),
+				name=rec.get("Location_Name_ZH", "").strip(),
+				name_en=rec.get("Location_Name_EN", "").strip(),
+				adm1=rec.get("Adm1_Name_ZH", "").strip(),
+				adm2=rec.get("Adm2_Name_ZH", "").strip(),
+				country=rec.get("Country_Region_ZH", "").strip(),
+				tz=rec.get("Timezone", "").strip(),
+				lat=lat,
+				lon=lon,
+			))
+	if header is None:
+		raise ValueError(f"{path} 不是和风城市列表 CSV（缺少 Location_ID 表头）")
+	return places
+
+
+def _syllables(readings: Iterable[str]) -> List[str]:
+	return [s.lower() for s in readings if s.isascii() and s.isalpha()]
+
+
+def _pinyin_keys(place: Place) -> List[Tuple[str, int]]:
+	"""拼音全拼与首字母：词组默认读音、多音字的各读音组合（如 朝阳 -> zhaoyang / chaoyang），
+	以及 CSV 英文名（和风国内地名的英文名即官方拼音）"""
+	# 仅构建索引时需要，运行时加载索引不依赖 pypinyin
+	from pypinyin import Style, lazy_pinyin, pinyin
+	per_char = [r for r in (_syllables(x) for x in pinyin(place.name, style=Style.NORMAL, heteronym=True)) if r]
+	variants = [_syllables(lazy_pinyin(place.name))]
+	variants += [list(v) for v in islice(product(*per_char), MAX_PINYIN_VARIANTS)] if per_char else []
+	keys: List[Tuple[str, int]] = []
+	for syllables in variants:
+		if not syllables:
+			continue
+		for key in (("".join(syllables), KEY_PINYIN), ("".join(s[0] for s in syllables), KEY_INITIALS)):
+			if key not in keys:
+				keys.append(key)
+	name_en = normalize(place.name_en)
+	if name_en.isascii() and name_en.isalpha() and (name_en, KEY_PINYIN) not in keys:
+		keys.append((name_en, KEY_PINYIN))
+	return keys
+
+
+def _keys_for(place: Place) -> Iterable[Tuple[str, int]]:
+	name = normalize(place.name)
+	if name:
+		yield name, KEY_NAME
+	yield from _pinyin_keys(place)
+	if place.adm2 and place.adm2 != place.name:
+		yield normalize(place.adm2) + name, KEY_ADM2_NAME
+	if place.adm1 and place.adm1 not in (place.name, place.adm2):
+		yield normalize(place.adm1) + name, KEY_ADM1_NAME
+
+
+def write_index(places: List[Place], path: str | os.PathLike) -> Dict[str, int]:
+	"""写出二进制索引（先写临时文件再原子替换，运行中的进程继续使用旧映射）"""
+	strings = bytearray()
+	offsets: Dict[str, int] = {}
+
+	def intern(value: str) -> int:
+		off = offsets.get(value)
+		if off is None:
+			data = value.encode("utf-8")[:0xFFFF]
+			off = len(strings)
+			strings.extend(_STR_LEN.pack(len(data)))
+			strings.extend(data)
+			offsets[value] = off
+		return off
+
+	place_table = bytearray()
+	keys: Dict[Tuple[bytes, int], int] = {}
+	for i, p in enumerate(places):
+		place_table.extend(_PLACE.pack(
+			p.lat, p.lon,
+			intern(p.id), intern(p.name), intern(p.name_en), intern(p.adm1), intern(p.adm2), intern(p.country), intern(p.tz),
+		))
+		for key, kind in _keys_for(p):
+			if key:
+				# 同一地点的同一键只保留排序最靠前的类型
+				k = (key.encode("utf-8"), i)
+				keys[k] = min(kind, keys.get(k, kind))
+
+	key_table = bytearray()
+	for (key, i), kind in sorted(keys.items()):
+		key_table.extend(_KEY.pack(intern(key.decode("utf-8")), i, kind))
+
+	places_off = _HEADER.size
+	keys_off = places_off + len(place_table)
+	strings_off = keys_off + len(key_table)
+	header = _HEADER.pack(MAGIC, VERSION, 0, len(places), len(keys), places_off, keys_off, strings_off)
+	path = Path(path)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_suffix(path.suffix + ".tmp")
+	with open(tmp, "wb") as f:
+		f.write(header)
+		f.write(place_table)
+		f.write(key_table)
+		f.write(strings)
+	os.replace(tmp, path)
+	return {"places": len(places), "keys": len(keys), "bytes": strings_off + len(strings)}
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+	p1, p2 = math.radians(lat1), math.radians(lat2)
+	dp, dl = p2 - p1, math.radians(lon2 - lon1)
+	a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+	return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _bounded_distance(a: str, b: str, limit: int) -> int:
+	"""Levenshtein 距离，超过 limit 时提前返回 limit + 1"""
+	if abs(len(a) - len(b)) > limit:
+		return limit + 1
+	prev = list(range(len(b) + 1))
+	for i, ca in enumerate(a, 1):
+		cur = [i] + [0] * len(b)
+		best = i
+		for j, cb in enumerate(b, 1):
+			cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+			best = min(best, cur[j])
+		if best > limit:
+			return limit + 1
+		prev = cur
+	return prev[-1]
+
+
+class Gazetteer:
+	"""mmap 只读索引；search 返回与和风 /v2/city/lookup 的 location 项相同结构的字典"""
+
+	def __init__(self, path: str | os.PathLike):
+		self.path = str(path)
+		with open(self.path, "rb") as f:
+			self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, version, _, self._n_places, self._n_keys, self._places_off, self._keys_off, self._strings_off = \
+			_HEADER.unpack_from(self._mm, 0)
+		if magic != MAGIC or version != VERSION:
+			self._mm.close()
+			raise ValueError(f"{self.path} 不是有效的城市索引（magic={magic!r}, version={version}）")
+		self._grid: Optional[Dict[Tuple[int, int], List[Tuple[int, float, float]]]] = None
+		self._ids: Optional[Dict[str, int]] = None
+
+	def __len__(self) -> int:
+		return self._n_places
+
+	def close(self) -> None:
+		self._mm.close()
+
+	def _str_bytes(self, off: int) -> bytes:
+		start = self._strings_off + off
+		(length,) = _STR_LEN.unpack_from(self._mm, start)
+		return self._mm[start + 2:start + 2 + length]
+
+	def _str(self, off: int) -> str:
+		return self._str_bytes(off).decode("utf-8")
+
+	def _key(self, i: int) -> Tuple[bytes, int, int]:
+		key_off, place, kind = _KEY.unpack_from(self._mm, self._keys_off + i * _KEY.size)
+		return self._str_bytes(key_off), place, kind
+
+	def _lower_bound(self, prefix: bytes) -> int:
+		lo, hi = 0, self._n_keys
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self._key(mid)[0] < prefix:
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo
+
+	def place(self, i: int) -> Place:
+		lat, lon, *refs = _PLACE.unpack_from(self._mm, self._places_off + i * _PLACE.size)
+		id_, name, name_en, adm1, adm2, country, tz = (self._str(r) for r in refs)
+		return Place(id_, name, name_en, adm1, adm2, country, tz, lat, lon)
+
+	def by_id(self, location_id: str) -> Optional[Place]:
+		"""按和风 location id 查找（首次调用时建立 id -> 序号映射）"""
+		if self._ids is None:
+			self._ids = {}
+			for i in range(self._n_places):
+				(id_off,) = struct.unpack_from("<I", self._mm, self._places_off + i * _PLACE.size + 16)
+				self._ids[self._str(id_off)] = i
+		i = self._ids.get(location_id)
+		return self.place(i) if i is not None else None
+
+	def _build_grid(self) -> Dict[Tuple[int, int], List[Tuple[int, float, float]]]:
+		grid: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+		for i in range(self._n_places):
+			lat, lon = struct.unpack_from("<dd", self._mm, self._places_off + i * _PLACE.size)
+			cell = (math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES))
+			grid.setdefault(cell, []).append((i, lat, lon))
+		return grid
+
+	def nearest(self, lat: float, lon: float, max_km: float = MAX_REVERSE_KM) -> Optional[Tuple[Place, float]]:
+		"""最近的地点及距离（公里）；max_km 内没有地点时返回 None
+
+		从坐标所在格向外逐圈检查，当前最近距离不超过未检查圈的距离下界时停止，
+		查询代价只与局部地点密度有关，与地点总数无关。
+		"""
+		if self._grid is None:
+			# 首次查询时由坐标列构建（约数千个地点，毫秒级）
+			self._grid = self._build_grid()
+		grid = self._grid
+		row, col = math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES)
+
+		# 经线方向的格宽随纬度收窄：第 r 圈按其可能到达的最高纬度估计最小距离
+		def ring_km(r: int) -> float:
+			return GRID_DEGREES * _KM_PER_DEGREE * math.cos(math.radians(min(89.0, abs(lat) + (r + 1) * GRID_DEGREES)))
+
+		best: Optional[Tuple[float, int]] = None
+		r = 0
+		while True:
+			# 已检查 0..r-1 圈，其余地点距离不小于 (r - 1) 个格宽
+			lower = (r - 1) * ring_km(r)
+			if (best is not None and best[0] <= lower) or lower > max_km or r > 360:
+				break
+			for dr in range(-r, r + 1):
+				step = 1 if abs(dr) == r else 2 * r
+				for dc in range(-r, r + 1, max(step, 1)):
+					for i, plat, plon in grid.get((row + dr, col + dc), ()):
+						d = haversine_km(lat, lon, plat, plon)
+						if best is None or d < best[0]:
+							best = (d, i)
+			r += 1
+		if best is None or best[0] > max_km:
+			return None
+		return self.place(best[1]), best[0]
+
+	def _prefix_matches(self, q: bytes) -> Dict[int, Tuple]:
+		found: Dict[int, Tuple] = {}
+		i = self._lower_bound(q)
+		end = min(self._n_keys, i + MAX_PREFIX_SCAN)
+		while i < end:
+			key, place, kind = self._key(i)
+			if not key.startswith(q):
+				break
+			score = (key != q, kind, len(key))
+			if place not in found or score < found[place]:
+				found[place] = score
+			i += 1
+		return found
+
+	def _fuzzy_matches(self, q: str) -> Dict[int, Tuple]:
+		"""拼写容错：在首字相同的检索键中查找编辑距离不超过 1（较长拼音为 2）的键或键前缀"""
+		limit = 2 if not _is_cjk(q) and len(q) >= 8 else 1
+		first = q[0].encode("utf-8")
+		found: Dict[int, Tuple] = {}
+		i = self._lower_bound(first)
+		while i < self._n_keys:
+			raw, place, kind = self._key(i)
+			if not raw.startswith(first):
+				break
+			i += 1
+			key = raw.decode("utf-8")
+			dist = min(
+				_bounded_distance(q, key[:n], limit)
+				for n in (len(q) - 1, len(q), len(q) + 1) if 0 < n <= len(key)
+			) if len(key) >= len(q) - limit else limit + 1
+			if dist <= limit:
+				score = (True, dist, kind, len(key))
+				if place not in found or score < found[place]:
+					found[place] = score
+		return found
+
+	def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+		q = normalize(query)
+		if not q:
+			return []
+		found = self._prefix_matches(q.encode("utf-8"))
+		# 容错匹配仅用于中文或较长的拼音，避免把海外城市名误配到国内地名上
+		if not found and len(q) >= 2 and (_is_cjk(q) or len(q) >= 5):
+			found = self._fuzzy_matches(q)
+		ranked = sorted(found.items(), key=lambda item: (item[1], item[0]))[:limit]
+		return [self.to_location(self.place(i)) for i, _ in ranked]
+
+	@staticmethod
+	def rank(place: Place) -> str:
+		name = normalize(place.name)
+		if place.adm1 and normalize(place.adm1) == name:
+			return RANK_ADM1
+		if place.adm2 and normalize(place.adm2) == name:
+			return RANK_ADM2
+		return RANK_COUNTY
+
+	@staticmethod
+	def to_location(place: Place) -> Dict[str, Any]:
+		return {
+			"name": place.name,
+			"id": place.id,
+			"lat": f"{place.lat:.5f}".rstrip("0").rstrip("."),
+			"lon": f"{place.lon:.5f}".rstrip("0").rstrip("."),
+			"adm2": place.adm2,
+			"adm1": place.adm1,
+			"country": place.country,
+			"tz": place.tz,
+			"type": "city",
+			"rank": Gazetteer.rank(place),
+		}
+
+	def stats(self) -> Dict[str, Any]:
+		return {"path": self.path, "places": self._n_places, "keys": self._n_keys, "bytes": len(self._mm)}
+
+
+# 进程内单例：lifespan 中 load()，索引文件不存在时为 None（/api/geo 全部走和风）
+_gazetteer: Optional[Gazetteer] = None
+_stats: Dict[str, int] = {"local_hits": 0, "local_misses": 0, "reverse_hits": 0, "reverse_misses": 0}
+
+
+def load(path: str | os.PathLike | None = None) -> Optional[Gazetteer]:
+	global _gazetteer
+	path = Path(path) if path else DEFAULT_INDEX_PATH
+	if not path.exists():
+		logger.info("未找到城市索引 %s，城市搜索将直接请求和风（可运行 backend/gazetteer/build_index.py 生成）", path)
+		return None
+	try:
+		gz = Gazetteer(path)
+	except (OSError, ValueError, struct.error) as e:
+		logger.warning("城市索引加载失败，城市搜索将直接请求和风: %s", e)
+		return None
+	close()
+	_gazetteer = gz
+	logger.info("城市索引已加载：%s（%d 个地点）", path, len(gz))
+	return gz
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+	return _gazetteer
+
+
+def close() -> None:
+	global _gazetteer
+	if _gazetteer is not None:
+		_gazetteer.close()
+		_gazetteer = None
+
+
+def search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+	"""本地检索；未加载索引时返回空列表"""
+	if _gazetteer is None:
+		return []
+	results = _gazetteer.search(query, limit)
+	_stats["local_hits" if results else "local_misses"] += 1
+	return results
+
+
+def nearest(lat: float, lon: float, max_km: float = MAX_REVERSE_KM) -> Optional[Tuple[Dict[str, Any], float]]:
+	"""反向地理编码：返回最近地点（和风 location 结构）与距离（公里）；未加载索引或超出 max_km 时返回 None"""
+	if _gazetteer is None:
+		return None
+	found = _gazetteer.nearest(lat, lon, max_km)
+	_stats["reverse_hits" if found else "reverse_misses"] += 1
+	if found is None:
+		return None
+	place, distance = found
+	return Gazetteer.to_location(place), distance
+
+
+def lookup_id(location_id: str) -> Optional[Dict[str, Any]]:
+	"""按和风 location id 取地点（和风 location 结构）；未加载索引或不存在时返回 None"""
+	if _gazetteer is None:
+		return None
+	place = _gazetteer.by_id(location_id)
+	return Gazetteer.to_location(place) if place is not None else None
+
+
+def stats() -> Dict[str, Any]:
+	"""索引信息与命中计数（用于 /api/metrics）"""
+	return {**_stats, "index": _gazetteer.stats() if _gazetteer is not None else None}
@@ -4,9 +4,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
 from app.database.models import EmailNotification, EmailSchedule, UserFavorite
-from app.services.qweather import weather_now, weather_3d
+from app.services.qweather import now_record, daily_entry, fresh_entry
 from app.services.email_service import email_service
+from app.services.city_service import city_service
+from app.services import astronomy
 from app.services.rag_service import (
+	build_weather_info,
 	build_query_from_weather,
 	retrieve_rag_context,
 	generate_advice,
@@ -45,53 +48,63 @@ class NotificationService:
 		last = result.scalar_one_or_none()
 		return not last or last <= threshold
 	
-	def _compose_text(self, city_name: str, now_data: dict, today_data: dict | None) -> str:
-		now = now_data.get("now", {})
-		obs = now.get("obsTime", "").replace("T", " ").replace("+08:00", "")
-		text = now.get("text", "")
-		temp = now.get("temp", "")
-		feels = now.get("feelsLike", "")
-		wind_dir = now.get("windDir", "")
-		wind_scale = now.get("windScale", "")
-		hum = now.get("humidity", "")
-		max_t, min_t = "", ""
-		if today_data:
-			try:
-				max_t = today_data["daily"][0]["tempMax"]
-				min_t = today_data["daily"][0]["tempMin"]
-			except Exception:
-				pass
-		return (
-			f"现在是 {obs}，{city_name} {text}。当前 {temp}°C，体感 {feels}°C，{wind_dir}{wind_scale}级，湿度 {hum}%"
+	def _compose_text(self, city_name: str, info: dict, astro: str = "") -> str:
+		max_t, min_t = info["temp_max"], info["temp_min"]
+		text = (
+			f"现在是 {info['obs_time']}，{city_name} {info['condition'] or ''}。"
+			f"当前 {info['temp'] or ''}°C，体感 {info['feels_like'] or ''}°C，"
+			f"{info['wind_dir'] or ''}{info['wind_scale'] or ''}级，湿度 {info['humidity'] or ''}%"
 			+ (f"；今日最高 {max_t}°C、最低 {min_t}°C" if max_t and min_t else "")
 		)
+		# 预先计算的派生指标（随预报缓存）
+		extras = []
+		if info["comfort"] is not None:
+			extras.append(f"舒适度 {info['comfort']}/100")
+		if info["rain_windows"]:
+			extras.append("降水时段 " + "、".join(info["rain_windows"]))
+		if info["best_window"]:
+			extras.append(f"适宜出门 {info['best_window']}")
+		lines = [text]
+		if extras:
+			lines.append("；".join(extras))
+		if astro:
+			lines.append(astro)
+		return "\n".join(lines)
 	
-	async def preview(self, city_id: str, city_name: str) -> str:
+	async def _astronomy_text(self, db: AsyncSession | None, city_id: str) -> str:
+		"""今日日出日落、昼长与月相（按城市坐标本地计算，不请求和风）"""
+		loc = await city_service.get_location(db, city_id)
+		if loc is None:
+			return ""
+		today = datetime.now(TZ_SH).date()
+		row = astronomy.for_location(loc["lat"], loc["lon"], [today], loc["tz"]).daily(0)[0]
+		hours, minutes = divmod(row["dayLength"], 60)
+		sun = f"日出 {row['sunrise']}、日落 {row['sunset']}，" if row["sunrise"] and row["sunset"] else ""
+		return f"{sun}昼长 {hours} 小时 {minutes} 分；月相 {row['moonPhase']}（亮面 {row['moonIllumination']}%）"
+	
+	async def preview(self, city_id: str, city_name: str, db: AsyncSession | None = None) -> str:
 		# 并发请求，单个失败不让整体失败
-		now_res, d3_res = await asyncio.gather(
-			weather_now(city_id),
-			weather_3d(city_id),
+		now_res, daily_res, hourly_res, astro_res = await asyncio.gather(
+			now_record(city_id),
+			daily_entry(city_id),
+			# 降水时段/最佳出行时段只在已有新鲜的 24 小时缓存时附带，不为此单独回源
+			fresh_entry("24h", city_id),
+			self._astronomy_text(db, city_id),
 			return_exceptions=True,
 		)
-		now = {} if isinstance(now_res, Exception) else now_res
-		d3 = {} if isinstance(d3_res, Exception) else d3_res
-		base_text = self._compose_text(city_name, now, d3 if d3 else None)
+		now = None if isinstance(now_res, Exception) else now_res
+		daily = None if isinstance(daily_res, Exception) else daily_res
+		hourly = None if isinstance(hourly_res, Exception) else hourly_res
+		weather_info = build_weather_info(
+			city_name, now,
+			daily.record if daily else None,
+			daily_metrics=daily.metrics if daily else None,
+			hourly_metrics=hourly.metrics if hourly else None,
+		)
+		astro = "" if isinstance(astro_res, Exception) else astro_res
+		base_text = self._compose_text(city_name, weather_info, astro)
 		# 组织天气信息，生成 RAG + LLM 建议
 		try:
-			now_data = now.get("now", {}) if isinstance(now, dict) else {}
-			first_day = (d3.get("daily", [{}])[0]) if isinstance(d3, dict) and d3 else {}
-			weather_info = {
-				"city_name": city_name,
-				"obs_time": (now_data.get("obsTime", "").replace("T", " ").replace("+08:00", "")),
-				"condition": now_data.get("text"),
-				"temp": now_data.get("temp"),
-				"feels_like": now_data.get("feelsLike"),
-				"wind_dir": now_data.get("windDir"),
-				"wind_scale": now_data.get("windScale"),
-				"humidity": now_data.get("humidity"),
-				"temp_max": first_day.get("tempMax"),
-				"temp_min": first_day.get("tempMin"),
-			}
 			query = build_query_from_weather(weather_info)
 			rag_ctx = retrieve_rag_context(query, top_k=4)
 			advice = generate_advice(weather_info, rag_ctx)
@@ -110,7 +123,7 @@ class NotificationService:
 				return False, f"操作过于频繁，请稍后再试（{MIN_INTERVAL_SECONDS}秒后）", quota
 		else:
 			quota = DAILY_QUOTA
-		text = await self.preview(city_id, city_name)
+		text = await self.preview(city_id, city_name, db)
 		subject = f"天语 · 今日天气｜{city_name}"
 		ok = await email_service.send_plain_email(email, subject, text)
 		rec = EmailNotification(
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, List
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.services import qweather
+from app.services.city_service import city_service
+from app.services.qweather_quota import qweather_priority, PRIORITY_PREFETCH
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_KINDS = ("now", "24h", "7d")
+
+
+class WeatherPrefetcher:
+	"""热门城市天气预取：在缓存软过期前提前回源，让用户请求尽量命中缓存。
+	热度排序：
+	- 实时访问：qweather 记录的访问次数，按 decay 指数衰减累积
+	- 种子：收藏人数与热门搜索城市（每 seed_refresh_seconds 从数据库重新加载）
+	资源控制：
+	- 每轮最多 max_per_tick 次上游请求，并走 prefetch 优先级通道（配额紧张时先让行）
+	- 遇到配额不足（429）或熔断（503）时结束本轮
+	"""
+	def __init__(self, session_factory: async_sessionmaker[AsyncSession], interval_seconds: int = 60,
+	             top_n: int = 50, lead_seconds: float = 120, max_per_tick: int = 30,
+	             decay: float = 0.8, seed_refresh_seconds: int = 3600):
+		self._session_factory = session_factory
+		self._interval = interval_seconds
+		self._top_n = top_n
+		self._lead = lead_seconds
+		self._max_per_tick = max_per_tick
+		self._decay = decay
+		self._seed_refresh = seed_refresh_seconds
+		self._scores: Dict[str, float] = {}
+		self._seeds: Dict[str, float] = {}
+		self._seeds_loaded_at = 0.0
+		self._running = False
+		self._task: Optional[asyncio.Task] = None
+		self.stats = {"ticks": 0, "refreshed": 0, "skipped_fresh": 0, "budget_exhausted": 0, "errors": 0}
+
+	async def _load_seeds(self):
+		"""从收藏与热门搜索加载种子城市并解析为和风 location id"""
+		weights: Dict[tuple, float] = {}
+		async with self._session_factory() as db:
+			for city_name, province, count in await city_service.get_favorite_city_counts(db, limit=self._top_n):
+				weights[(city_name, province)] = weights.get((city_name, province), 0.0) + count * 2.0
+			for city in await city_service.get_popular_cities(db, limit=self._top_n):
+				key = (city.city_name, city.province)
+				weights[key] = weights.get(key, 0.0) + min(city.search_count, 100) * 0.1
+			seeds: Dict[str, float] = {}
+			for (city_name, province), weight in weights.items():
+				try:
+					location_id = await city_service.resolve_location_id(db, city_name, province)
+				except HTTPException:
+					continue
+				if location_id:
+					seeds[location_id] = seeds.get(location_id, 0.0) + weight
+		self._seeds = seeds
+		self._seeds_loaded_at = time.monotonic()
+
+	def _rank(self) -> List[str]:
+		# 指数衰减：旧热度逐轮衰减，新访问与种子权重叠加
+		accesses = qweather.take_access_counts()
+		scores: Dict[str, float] = {}
+		for location in set(self._scores) | set(accesses) | set(self._seeds):
+			score = self._scores.get(location, 0.0) * self._decay + accesses.get(location, 0) + self._seeds.get(location, 0.0)
+			if score >= 0.01:
+				scores[location] = score
+		self._scores = scores
+		return sorted(scores, key=scores.get, reverse=True)[:self._top_n]
+
+	async def _tick(self):
+		self.stats["ticks"] += 1
+		if time.monotonic() - self._seeds_loaded_at >= self._seed_refresh:
+			try:
+				await self._load_seeds()
+			except Exception as e:
+				self.stats["errors"] += 1
+				self._seeds_loaded_at = time.monotonic()
+				logger.error(f"Prefetch seed load error: {e}")
+		budget = self._max_per_tick
+		for location in self._rank():
+			for kind in PREFETCH_KINDS:
+				if budget <= 0:
+					return
+				try:
+					if await qweather.prefetch(location, kind, self._lead):
+						budget -= 1
+						self.stats["refreshed"] += 1
+					else:
+						self.stats["skipped_fresh"] += 1
+				except HTTPException as e:
+					if e.status_code in (429, 503):
+						self.stats["budget_exhausted"] += 1
+						return
+					self.stats["errors"] += 1
+
+	async def _loop(self):
+		self._running = True
+		while self._running:
+			try:
+				with qweather_priority(PRIORITY_PREFETCH):
+					await self._tick()
+			except Exception as e:
+				# 避免异常中断循环
+				self.stats["errors"] += 1
+				logger.error(f"Prefetch tick error: {e}")
+			await asyncio.sleep(self._interval)
+
+	def start(self):
+		if self._task and not self._task.done():
+			return
+		self._task = asyncio.create_task(self._loop(), name="weather-prefetcher")
+
+	async def stop(self):
+		self._running = False
+		if self._task:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
@@ -1,31 +1,198 @@
-import os
-from typing import Any, Dict, Optional, List
-from pathlib import Path
+import time
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, List, NamedTuple, Tuple
 
 import httpx
-from cachetools import TTLCache
+import orjson
+from cachetools import LRUCache
 from fastapi import HTTPException, status
-from dotenv import load_dotenv
 
+from app.core.config import settings
+from app.core.runtime_config import get_runtime_config
+from app.services.cache_backends import CacheBackend, CacheEntry, MemoryCacheBackend, build_cache_backend
+from app.services.qweather_quota import quota_governor, current_priority, shared_priority, PriorityRef
+from app.services.qweather_breaker import CircuitBreaker
+from app.services.qweather_retry import RetryPolicy, RetryBudget, LatencyTracker
+from app.services.weather_records import NowRecord, HourlyRecord, DailyRecord
+
+logger = logging.getLogger(__name__)
 
-# 明确从 backend/.env 加载环境变量，避免启动目录不同找不到 .env
-ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
-# 初始加载一次，下面的函数每次请求会再次加载覆盖
-load_dotenv(dotenv_path=ENV_PATH, override=True)
 
 def _get_hosts() -> tuple[str, str]:
-	# 每次请求前刷新环境变量，支持运行时修改 .env
-	load_dotenv(dotenv_path=ENV_PATH, override=True)
-	base = os.getenv("QWEATHER_BASE", "https://devapi.qweather.com")
-	geo = os.getenv("QWEATHER_GEO", "https://geoapi.qweather.com")
-	return base, geo
+	# 读取内存中的配置快照；.env 变更由 runtime_config 后台检测并替换快照
+	cfg = get_runtime_config()
+	return cfg.qweather_base, cfg.qweather_geo
+
+
+class TTLPolicy(NamedTuple):
+	"""单个接口的缓存策略（秒）
+	- refresh: 上游数据刷新周期，软过期按 updateTime + refresh 对齐
+	- min_soft: 软过期下限，避免 updateTime 偏旧时反复回源
+	- stale_grace: 软过期后仍可先返回旧值（后台刷新）的时长，之后硬过期
+	"""
+	refresh: float
+	min_soft: float
+	stale_grace: float
+
+
+TTL_POLICIES: Dict[str, TTLPolicy] = {
+	"geo": TTLPolicy(refresh=7 * 86400, min_soft=86400, stale_grace=7 * 86400),
+	"now": TTLPolicy(refresh=600, min_soft=60, stale_grace=1200),
+	"24h": TTLPolicy(refresh=3600, min_soft=300, stale_grace=3600),
+	"7d": TTLPolicy(refresh=4 * 3600, min_soft=600, stale_grace=4 * 3600),
+	"3d": TTLPolicy(refresh=4 * 3600, min_soft=600, stale_grace=4 * 3600),
+}
+# 和风返回业务错误码（非 "200"）时的短缓存，避免把错误结果长期缓存
+ERROR_TTL_SECONDS = 60
+
+
+def _parse_update_time(data: Dict[str, Any]) -> float | None:
+	value = data.get("updateTime") if isinstance(data, dict) else None
+	if not value:
+		return None
+	try:
+		return datetime.fromisoformat(value).timestamp()
+	except ValueError:
+		return None
+
+
+def _make_entry(kind: str, data: Dict[str, Any], now: float | None = None, raw: bytes | None = None) -> CacheEntry:
+	"""按接口策略与上游 updateTime 计算软/硬过期时间；raw 为上游原始响应体，命中时原样返回"""
+	now = time.time() if now is None else now
+	if not isinstance(data, dict) or data.get("code") != "200":
+		return CacheEntry(data, kind, now, now + ERROR_TTL_SECONDS, now + ERROR_TTL_SECONDS, raw=raw)
+	policy = TTL_POLICIES[kind]
+	soft = now + policy.refresh
+	updated = _parse_update_time(data)
+	if updated is not None:
+		# 下一次上游更新预计在 updateTime + refresh，到点再刷新
+		soft = min(soft, updated + policy.refresh)
+	soft = max(soft, now + policy.min_soft)
+	return CacheEntry(data, kind, now, soft, soft + policy.stale_grace, raw=raw)
+
+
+# 一级缓存后端：默认进程内缓存，startup() 时按 QWEATHER_CACHE_BACKEND 替换
+_cache: CacheBackend = MemoryCacheBackend(maxsize=settings.qweather_cache_maxsize, max_bytes=settings.qweather_cache_max_bytes)
+
+
+def configure_cache(backend: CacheBackend) -> None:
+	global _cache
+	_cache = backend
+
+# 进行中的上游请求（按缓存 key 去重）及其优先级，与计数器
+_inflight: Dict[str, asyncio.Task] = {}
+_inflight_priority: Dict[str, PriorityRef] = {}
+_stats: Dict[str, int] = {
+	"cache_hits": 0,
+	"cache_misses": 0,
+	"upstream_calls": 0,
+	"coalesced": 0,
+	"stale_served": 0,
+	"background_refreshes": 0,
+	"l2_hits": 0,
+	"l2_misses": 0,
+	"l2_errors": 0,
+	"cache_errors": 0,
+	"circuit_rejected": 0,
+	"stale_on_error": 0,
+	"prefetched": 0,
+	"retries": 0,
+	"hedged": 0,
+	"hedge_wins": 0,
+	"derived_3d": 0,
+}
+# 访问计数（由预取任务定期取走清零），限制跟踪的城市数避免无界增长
+MAX_TRACKED_LOCATIONS = 10000
+_access_counts: Counter[str] = Counter()
+
+# 按主机的熔断器；以及最近一次成功结果（不随缓存过期淘汰），用于上游故障时降级
+STALE_RETRY_SECONDS = 5
+_breakers: Dict[str, CircuitBreaker] = {}
+_last_good: LRUCache[str, CacheEntry] = LRUCache(maxsize=settings.qweather_stale_max_entries)
 
-_cache: TTLCache[str, Any] = TTLCache(maxsize=1024, ttl=60)
+# 重试策略、重试预算与上游延迟统计（对冲请求使用 p95）
+_retry_policy = RetryPolicy(
+	max_attempts=settings.qweather_retry_max_attempts,
+	base_delay=settings.qweather_retry_base_delay,
+	max_delay=settings.qweather_retry_max_delay,
+)
+_retry_budget = RetryBudget(ratio=settings.qweather_retry_budget_ratio)
+_latency = LatencyTracker()
+
+# 进程级共享 HTTP 客户端：复用连接池，避免每次请求重复 DNS/TCP/TLS 握手
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+	http2 = settings.qweather_http2
+	if http2:
+		try:
+			import h2  # noqa: F401
+		except ImportError:
+			# 未安装 h2 时退回 HTTP/1.1
+			http2 = False
+	return httpx.AsyncClient(
+		http2=http2,
+		timeout=httpx.Timeout(settings.qweather_timeout, connect=settings.qweather_connect_timeout),
+		limits=httpx.Limits(
+			max_connections=settings.qweather_max_connections,
+			max_keepalive_connections=settings.qweather_max_keepalive,
+			keepalive_expiry=settings.qweather_keepalive_expiry,
+		),
+	)
+
+
+def get_client() -> httpx.AsyncClient:
+	"""获取共享客户端；未经 lifespan 初始化时（如脚本调用）按需创建"""
+	global _client
+	if _client is None or _client.is_closed:
+		_client = _build_client()
+	return _client
+
+
+async def startup() -> None:
+	"""按配置创建缓存后端与共享客户端，并预热到 base/geo 主机的连接"""
+	if settings.qweather_cache_backend != _cache.name:
+		try:
+			configure_cache(build_cache_backend(
+				settings.qweather_cache_backend,
+				maxsize=settings.qweather_cache_maxsize,
+				max_bytes=settings.qweather_cache_max_bytes,
+				path=settings.qweather_cache_mmap_path,
+				slots=settings.qweather_cache_mmap_slots,
+				slot_size=settings.qweather_cache_mmap_slot_size,
+				url=settings.redis_url,
+			))
+		except Exception as e:
+			# 共享后端不可用（如 Windows 下的 mmap、未安装 redis）时保留进程内缓存
+			logger.error(f"QWeather cache backend init failed, using memory: {e}")
+	client = get_client()
+	base, geo = _get_hosts()
+	# 预热失败不影响启动，首个请求会自行建立连接
+	try:
+		await asyncio.wait_for(
+			asyncio.gather(*(client.head(host) for host in {base, geo}), return_exceptions=True),
+			timeout=settings.qweather_connect_timeout,
+		)
+	except asyncio.TimeoutError:
+		pass
+
+
+async def shutdown() -> None:
+	"""关闭共享客户端与缓存后端"""
+	global _client
+	if _client is not None:
+		await _client.aclose()
+		_client = None
+	await _cache.close()
+	configure_cache(MemoryCacheBackend(maxsize=settings.qweather_cache_maxsize, max_bytes=settings.qweather_cache_max_bytes))
 
 
 def _ensure_api_key() -> str:
-	load_dotenv(dotenv_path=ENV_PATH, override=True)
-	api_key = os.getenv("QWEATHER_API_KEY")
+	api_key = get_runtime_config().qweather_api_key
 	if not api_key:
 		raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail={
 			"code": "QWEATHER_API_KEY_MISSING",
@@ -35,36 +202,211 @@ def _ensure_api_key() -> str:
 
 
 def _cache_key(url: str, params: Dict[str, Any]) -> str:
-	# 生成稳定的 key
+	# 生成稳定的 key（不含 API Key：密钥不落库，轮换密钥后缓存仍可复用）
 	key = url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params.keys()))
 	return key
 
 
-async def _get_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
-	api_key = _ensure_api_key()
-	params_with_key = {**params, "key": api_key}
+# 二级缓存（数据库 weather_cache 表），由 lifespan 调用 enable_l2() 接入
+L2_READ_TIMEOUT_SECONDS = 0.5
+_l2_session_factory = None
+_l2_writer = None
+
+
+def enable_l2(session_factory, writer) -> None:
+	global _l2_session_factory, _l2_writer
+	_l2_session_factory = session_factory
+	_l2_writer = writer
+
+
+def disable_l2() -> None:
+	global _l2_session_factory, _l2_writer
+	_l2_session_factory = None
+	_l2_writer = None
+
+
+def _utc_naive(ts: float) -> datetime:
+	return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
 
-	key = _cache_key(url, params_with_key)
-	if key in _cache:
-		return _cache[key]
 
-	retry = 0
+def _utc_ts(dt: datetime) -> float:
+	return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+async def _cache_get(key: str) -> CacheEntry | None:
+	try:
+		return await _cache.get(key)
+	except Exception:
+		# 共享后端（如 Redis）不可用时按未命中处理
+		_stats["cache_errors"] += 1
+		return None
+
+
+async def _cache_set(key: str, entry: CacheEntry) -> None:
+	try:
+		await _cache.set(key, entry)
+	except Exception:
+		_stats["cache_errors"] += 1
+
+
+async def _l2_get(key: str, kind: str) -> CacheEntry | None:
+	if _l2_session_factory is None:
+		return None
+	from app.services.weather_cache_service import weather_cache_service
+	try:
+		async with _l2_session_factory() as db:
+			row = await asyncio.wait_for(
+				weather_cache_service.get_by_cache_key(db, key),
+				timeout=L2_READ_TIMEOUT_SECONDS,
+			)
+	except Exception:
+		# 数据库慢或不可用时直接回源，不影响请求
+		_stats["l2_errors"] += 1
+		return None
+	if row is None:
+		_stats["l2_misses"] += 1
+		return None
+	_stats["l2_hits"] += 1
+	hard = _utc_ts(row.expires_at)
+	soft = _utc_ts(row.soft_expires_at) if row.soft_expires_at else hard
+	# L2 中保存的即上游原始 JSON 文本，不在此解析
+	raw = row.weather_data.encode("utf-8") if row.weather_data else b"{}"
+	# 旧数据没有 fetched_at：按当前时间计（updated_at 是数据库本地时间，不可与 UTC 时间戳比较）
+	fetched = _utc_ts(row.fetched_at) if row.fetched_at else time.time()
+	return CacheEntry(None, kind, fetched, soft, hard, raw=raw)
+
+
+def _l2_put(key: str, params: Dict[str, Any], entry: CacheEntry) -> None:
+	if _l2_writer is None or not entry.ok:
+		return
+	_l2_writer.submit(
+		key,
+		str(params.get("location", "")),
+		entry.kind,
+		entry.raw.decode("utf-8"),
+		_utc_naive(entry.fetched_at),
+		_utc_naive(entry.soft_expires),
+		_utc_naive(entry.hard_expires),
+	)
+
+
+def _breaker_for(url: str) -> CircuitBreaker:
+	host = httpx.URL(url).host
+	breaker = _breakers.get(host)
+	if breaker is None:
+		breaker = CircuitBreaker(
+			host,
+			failure_threshold=settings.qweather_breaker_failures,
+			cooldown_seconds=settings.qweather_breaker_cooldown,
+			latency_slo_seconds=settings.qweather_latency_slo,
+			probe_timeout_seconds=settings.qweather_timeout * 2,
+		)
+		_breakers[host] = breaker
+	return breaker
+
+
+async def _send(client: httpx.AsyncClient, url: str, params: Dict[str, Any], breaker: CircuitBreaker) -> httpx.Response:
+	"""发送一次上游请求；开启对冲时，若超过近期 p95 仍未返回则再发一个请求，取先成功者"""
+	started = time.monotonic()
+	p95 = _latency.percentile(0.95) if settings.qweather_hedge_enabled else None
+	if p95 is None:
+		resp = await client.get(url, params=params)
+		_latency.record(time.monotonic() - started)
+		return resp
+
+	first = asyncio.ensure_future(client.get(url, params=params))
+	done, _ = await asyncio.wait({first}, timeout=max(p95, settings.qweather_hedge_min_delay))
+	# 对冲请求只在熔断器关闭时发出，并受重试预算与配额约束，任一不满足则继续等待首个请求；
+	# 预算最后扣除，被配额拒绝的对冲不消耗留给真实重试的预算
+	if (done or not breaker.is_closed or not _retry_budget.available()
+			or not quota_governor.try_acquire() or not _retry_budget.try_spend()):
+		resp = await first
+		_latency.record(time.monotonic() - started)
+		return resp
+
+	_stats["hedged"] += 1
+	hedge_started = time.monotonic()
+	_stats["upstream_calls"] += 1
+	second = asyncio.ensure_future(client.get(url, params=params))
+	pending = {first, second}
+	errors: List[BaseException] = []
+	try:
+		while pending:
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+			for task in done:
+				if task.exception() is None:
+					if task is second:
+						_stats["hedge_wins"] += 1
+					_latency.record(time.monotonic() - (hedge_started if task is second else started))
+					return task.result()
+				errors.append(task.exception())
+		raise errors[0]
+	finally:
+		for task in pending:
+			task.cancel()
+
+
+async def _fetch_upstream(url: str, params: Dict[str, Any], key: str, kind: str) -> CacheEntry:
+	"""请求上游并写入 L1/L2 缓存；按重试策略处理网络错误与 429/5xx，失败时抛出 HTTPException"""
+	params_with_key = {**params, "key": _ensure_api_key()}
+	client = get_client()
+	breaker = _breaker_for(url)
+	_retry_budget.record_request()
+	attempt = 0
 	last_exc: Exception | None = None
-	while retry < 2:  # 简单重试 1 次
-		async with httpx.AsyncClient(timeout=12.0) as client:
-			try:
-				resp = await client.get(url, params=params_with_key)
-				resp.raise_for_status()
-				data = resp.json()
-				_cache[key] = data
-				return data
-			except httpx.HTTPStatusError as exc:
-				last_exc = exc
-				break  # 状态码错误不重试
-			except httpx.HTTPError as exc:
-				last_exc = exc
-				retry += 1
-				continue
+	while True:
+		if not breaker.allow():
+			# 熔断打开：快速失败，不再占用连接与等待超时
+			_stats["circuit_rejected"] += 1
+			raise HTTPException(status_code=503, detail={
+				"code": "QWEATHER_CIRCUIT_OPEN",
+				"message": "和风天气服务暂时不可用，请稍后再试",
+			})
+		# 每次上游调用（含重试）都计入配额；额度不足时抛出 429
+		try:
+			await quota_governor.acquire()
+		except BaseException:
+			# 请求未到达上游：归还可能占用的探测名额
+			breaker.release_probe()
+			raise
+		attempt += 1
+		started = time.monotonic()
+		delay: float | None = None
+		try:
+			_stats["upstream_calls"] += 1
+			resp = await _send(client, url, params_with_key, breaker)
+			resp.raise_for_status()
+			breaker.record_success(time.monotonic() - started)
+			raw = resp.content
+			entry = _make_entry(kind, orjson.loads(raw), raw=raw)
+			await _cache_set(key, entry)
+			_l2_put(key, params, entry)
+			if entry.ok:
+				_last_good[key] = entry
+			return entry
+		except httpx.HTTPStatusError as exc:
+			last_exc = exc
+			code = exc.response.status_code
+			if code == 429 or code >= 500:
+				breaker.record_failure(f"HTTP {code}")
+			else:
+				breaker.record_success(time.monotonic() - started)
+			if code not in _retry_policy.retry_statuses:
+				break  # 其他状态码错误不重试
+			delay = _retry_policy.retry_after(exc.response)
+			if delay is not None and delay > _retry_policy.max_retry_after:
+				break  # 上游要求等待过久，直接失败（可降级为旧数据）
+		except httpx.HTTPError as exc:
+			breaker.record_failure(type(exc).__name__)
+			last_exc = exc
+
+		if attempt >= _retry_policy.max_attempts:
+			break
+		if not _retry_budget.try_spend():
+			# 重试预算耗尽：故障期间不放大上游流量
+			break
+		_stats["retries"] += 1
+		await asyncio.sleep(delay if delay is not None else _retry_policy.backoff(attempt))
 
 	# 失败时抛出更明确的异常
 	if isinstance(last_exc, httpx.HTTPStatusError):
@@ -79,38 +421,354 @@ async def _get_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
 		})
 
 
+def _stale_entry(entry: CacheEntry) -> CacheEntry:
+	"""上游故障时返回最近一次成功的数据，并带上 stale 标记与数据年龄（秒）"""
+	now = time.time()
+	data = {**entry.data, "stale": True, "staleAge": int(now - entry.fetched_at)}
+	# 不写回缓存；短暂的软过期避免每个请求都立即触发后台刷新
+	return CacheEntry(data, entry.kind, entry.fetched_at, now + STALE_RETRY_SECONDS, now + STALE_RETRY_SECONDS)
+
+
+def _can_serve_stale(exc: HTTPException) -> bool:
+	"""只有限流、熔断、网络错误与上游 429/5xx 可降级为旧数据；缺少密钥、鉴权失败等配置问题必须暴露出来"""
+	code = exc.detail.get("code") if isinstance(exc.detail, dict) else None
+	if code in ("QWEATHER_QUOTA_EXCEEDED", "QWEATHER_CIRCUIT_OPEN", "QWEATHER_NETWORK_ERROR"):
+		return True
+	return code == "QWEATHER_HTTP_ERROR" and (exc.status_code == 429 or exc.status_code >= 500)
+
+
+async def _fetch(url: str, params: Dict[str, Any], key: str, kind: str) -> CacheEntry:
+	try:
+		return await _fetch_upstream(url, params, key, kind)
+	except HTTPException as exc:
+		last = _last_good.get(key)
+		if last is None or not _can_serve_stale(exc):
+			raise
+		_stats["stale_on_error"] += 1
+		return _stale_entry(last)
+
+
+async def _load(url: str, params: Dict[str, Any], key: str, kind: str) -> CacheEntry:
+	"""L1 未命中：先查 L2，仍未命中再回源"""
+	entry = await _l2_get(key, kind)
+	if entry is not None:
+		await _cache_set(key, entry)
+		if entry.ok:
+			_last_good[key] = entry
+		return entry
+	return await _fetch(url, params, key, kind)
+
+
+def _on_fetch_done(key: str, task: asyncio.Task) -> None:
+	_inflight.pop(key, None)
+	_inflight_priority.pop(key, None)
+	# 发起方已取消且无其他等待者时，标记异常已读取，避免 "never retrieved" 警告
+	if not task.cancelled():
+		task.exception()
+
+
+def _start_task(key: str, coro) -> asyncio.Task:
+	"""单飞：同一 key 的并发请求只发起一次加载，其余调用共享同一任务
+
+	任务按发起方的优先级申请配额；更高优先级的调用方加入时提升该任务的优先级，
+	避免交互请求跟随后台通道等待（及其额度预留）
+	"""
+	task = _inflight.get(key)
+	if task is not None:
+		_stats["coalesced"] += 1
+		coro.close()
+		ref = _inflight_priority.get(key)
+		if ref is not None:
+			ref.promote(current_priority())
+		return task
+	ref = PriorityRef(current_priority())
+	with shared_priority(ref):
+		task = asyncio.ensure_future(coro)
+	_inflight[key] = task
+	_inflight_priority[key] = ref
+	task.add_done_callback(lambda t, k=key: _on_fetch_done(k, t))
+	return task
+
+
+async def _get_entry(url: str, params: Dict[str, Any], kind: str) -> CacheEntry:
+	_ensure_api_key()
+	location = params["location"]
+	if kind != "geo" and (location in _access_counts or len(_access_counts) < MAX_TRACKED_LOCATIONS):
+		# 用户访问计数，供预取任务做热度排序
+		_access_counts[location] += 1
+	key = _cache_key(url, params)
+	entry = await _cache_get(key)
+	if entry is None:
+		_stats["cache_misses"] += 1
+		task = _start_task(key, _load(url, params, key, kind))
+		# shield：单个调用方断开不会取消其他调用方共享的上游请求
+		entry = await asyncio.shield(task)
+	else:
+		_stats["cache_hits"] += 1
+	if time.time() >= entry.soft_expires and key not in _inflight:
+		# stale-while-revalidate：立即返回旧值，后台回源刷新
+		_stats["stale_served"] += 1
+		_stats["background_refreshes"] += 1
+		_start_task(key, _fetch(url, params, key, kind))
+	return entry
+
+
+# 天气类接口路径（base 主机）
+WEATHER_PATHS: Dict[str, str] = {
+	"now": "/v7/weather/now",
+	"24h": "/v7/weather/24h",
+	"7d": "/v7/weather/7d",
+	"3d": "/v7/weather/3d",
+}
+
+
+async def weather_entry(kind: str, location: str) -> CacheEntry:
+	"""天气类接口的缓存条目；路由直接返回 entry.raw，内部调用方使用 entry.record（或 entry.data）"""
+	base, _ = _get_hosts()
+	return await _get_entry(f"{base}{WEATHER_PATHS[kind]}", {"location": location}, kind)
+
+
+async def search_city_entry(query: str) -> CacheEntry:
+	"""城市搜索的缓存条目"""
+	_, geo = _get_hosts()
+	return await _get_entry(f"{geo}/v2/city/lookup", {"location": query}, "geo")
+
+
+def take_access_counts() -> Dict[str, int]:
+	"""取出并清零自上次调用以来各城市的访问次数"""
+	counts = dict(_access_counts)
+	_access_counts.clear()
+	return counts
+
+
+async def prefetch(location: str, kind: str, lead_seconds: float) -> bool:
+	"""提前刷新：缓存缺失或距软过期不足 lead_seconds 时回源，返回是否发起了上游请求
+
+	回源失败（含降级为旧数据）时抛出 HTTPException，限流/熔断/降级均为 429 或 503
+	"""
+	base, _ = _get_hosts()
+	url = f"{base}{WEATHER_PATHS[kind]}"
+	params = {"location": location}
+	key = _cache_key(url, params)
+	entry = await _cache_get(key)
+	now = time.time()
+	if entry is not None and (
+		entry.soft_expires - now > lead_seconds
+		# 刚拉取过的数据（上游 updateTime 滞后时软过期较短）不重复预取
+		or now - entry.fetched_at < TTL_POLICIES[kind].min_soft
+	):
+		return False
+	if key in _inflight:
+		return False
+	_stats["prefetched"] += 1
+	entry = await asyncio.shield(_start_task(key, _fetch(url, params, key, kind)))
+	if entry.stale:
+		# 回源失败被降级为旧数据（限流、熔断或上游故障）：按失败上报，预取任务据此停止本轮
+		raise HTTPException(status_code=503, detail={
+			"code": "QWEATHER_PREFETCH_DEGRADED",
+			"message": "和风天气暂不可用，预取已降级为旧数据",
+		})
+	return True
+
+
+def get_stats() -> Dict[str, Any]:
+	"""缓存与上游调用计数（用于 /api/metrics）"""
+	stats = {**_stats, "inflight": len(_inflight), "cache": _cache.stats()}
+	if _l2_writer is not None:
+		stats["l2_writer"] = dict(_l2_writer.stats)
+	stats["last_good_size"] = len(_last_good)
+	stats["last_good_bytes"] = sum(entry.nbytes() for entry in list(_last_good.values()))
+	stats["latency"] = _latency.stats()
+	stats["retry_budget"] = _retry_budget.stats()
+	stats["circuits"] = {host: b.stats() for host, b in _breakers.items()}
+	return stats
+
+
+def memory_report(limit: int = 20) -> Dict[str, Any]:
+	"""L1 缓存的内存明细（按类型汇总与最大条目）；共享后端没有进程内明细"""
+	return {"backend": _cache.name, "report": _cache.memory_report(limit)}
+
+
 async def search_city(query: str) -> Dict[str, Any]:
 	"""城市搜索API - 和风天气原生支持层级搜索"""
-	_, geo = _get_hosts()
-	url = f"{geo}/v2/city/lookup"
-	return await _get_json(url, {"location": query})
+	return (await search_city_entry(query)).data
 
 
 async def weather_now(location: str) -> Dict[str, Any]:
 	"""获取实时天气"""
-	base, _ = _get_hosts()
-	url = f"{base}/v7/weather/now"
-	return await _get_json(url, {"location": location})
+	return (await weather_entry("now", location)).data
 
 
 async def weather_24h(location: str) -> Dict[str, Any]:
 	"""获取24小时天气预报"""
-	base, _ = _get_hosts()
-	url = f"{base}/v7/weather/24h"
-	return await _get_json(url, {"location": location})
+	return (await weather_entry("24h", location)).data
 
 
 async def weather_7d(location: str) -> Dict[str, Any]:
 	"""获取7天天气预报"""
+	return (await weather_entry("7d", location)).data
+
+
+async def fresh_entry(kind: str, location: str) -> CacheEntry | None:
+	"""L1 中已缓存、未软过期且成功的条目（不触发回源）；用于可有可无的附加信息，避免为其多占一次配额"""
 	base, _ = _get_hosts()
-	url = f"{base}/v7/weather/7d"
-	return await _get_json(url, {"location": location})
+	entry = await _cache_get(_cache_key(f"{base}{WEATHER_PATHS[kind]}", {"location": location}))
+	if entry is None or time.time() >= entry.soft_expires or not entry.ok:
+		return None
+	return entry
 
 
 async def weather_3d(location: str) -> Dict[str, Any]:
-	"""获取3天天气预报（用于获取当日最高/最低气温）"""
+	"""获取3天天气预报（用于获取当日最高/最低气温）
+
+	7 天预报包含前 3 天的同样字段：已有新鲜的 7 天缓存时直接截取，省去一次上游调用
+	"""
+	entry = await fresh_entry("7d", location)
+	if entry is not None:
+		_stats["derived_3d"] += 1
+		data = entry.data
+		return {**data, "daily": (data.get("daily") or [])[:3]}
+	return (await weather_entry("3d", location)).data
+
+
+async def now_record(location: str) -> NowRecord | None:
+	"""实时天气的紧凑记录（数值为 float）；和风返回错误码时为 None"""
+	return (await weather_entry("now", location)).record
+
+
+async def hourly_record(location: str) -> HourlyRecord | None:
+	"""24 小时预报的列式记录"""
+	return (await weather_entry("24h", location)).record
+
+
+async def daily_entry(location: str) -> CacheEntry:
+	"""逐日预报条目，至少包含 3 天；与 weather_3d 相同，优先复用新鲜的 7 天缓存"""
+	entry = await fresh_entry("7d", location)
+	if entry is not None:
+		_stats["derived_3d"] += 1
+		return entry
+	return await weather_entry("3d", location)
+
+
+async def daily_record(location: str) -> DailyRecord | None:
+	"""逐日预报的列式记录"""
+	return (await daily_entry(location)).record
+
+
+# 批量/聚合接口可用的数据类型
+WEATHER_FETCHERS = {
+	"now": weather_now,
+	"24h": weather_24h,
+	"7d": weather_7d,
+}
+
+
+def business_error(data: Any) -> Dict[str, Any] | None:
+	"""和风业务错误码（如未知城市ID 返回 404）按单项错误记录，格式与请求失败相同；正常数据返回 None"""
+	if isinstance(data, dict) and data.get("code") == "200":
+		return None
+	code = data.get("code") if isinstance(data, dict) else None
+	return {"status": 502, "detail": f"和风返回错误码: {code}"}
+
+
+def exception_error(exc: BaseException) -> Dict[str, Any]:
+	"""单项请求失败的错误记录"""
+	if isinstance(exc, HTTPException):
+		return {"status": exc.status_code, "detail": exc.detail}
+	return {"status": 502, "detail": str(exc)}
+
+
+async def _is_cached(location: str, kind: str) -> bool:
+	"""L1 中是否已有该城市该类数据（不触发回源，过软过期也算，可先返回旧值）"""
 	base, _ = _get_hosts()
-	url = f"{base}/v7/weather/3d"
-	return await _get_json(url, {"location": location})
+	entry = await _cache_get(_cache_key(f"{base}{WEATHER_PATHS[kind]}", {"location": location}))
+	return entry is not None
+
+
+async def iter_many(locations: List[str], kinds: List[str], concurrency: int = 8) -> AsyncIterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+	"""逐城市产出 (location, results, errors)：所有数据已在缓存中的城市先产出，其余按完成先后产出
+
+	未缓存城市的上游请求并发受 concurrency 限制；调用方中途停止迭代时取消尚未完成的任务
+	（上游请求本身由单飞任务承担，不会被中断）。
+	"""
+	sem = asyncio.Semaphore(max(1, concurrency))
+	locations = list(dict.fromkeys(locations))
+	kinds = list(dict.fromkeys(kinds))
+
+	async def one_city(location: str, limited: bool) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+		results: Dict[str, Any] = {}
+		errors: Dict[str, Any] = {}
+
+		async def one(kind: str):
+			try:
+				if limited:
+					async with sem:
+						data = await WEATHER_FETCHERS[kind](location)
+				else:
+					data = await WEATHER_FETCHERS[kind](location)
+			except Exception as exc:
+				errors[kind] = exception_error(exc)
+				return
+			error = business_error(data)
+			if error is None:
+				results[kind] = data
+			else:
+				errors[kind] = error
+
+		await asyncio.gather(*(one(kind) for kind in kinds))
+		return location, results, errors
+
+	pending: List[str] = []
+	for location in locations:
+		if all([await _is_cached(location, kind) for kind in kinds]):
+			yield await one_city(location, limited=False)
+		else:
+			pending.append(location)
+
+	tasks = [asyncio.ensure_future(one_city(location, limited=True)) for location in pending]
+	try:
+		for fut in asyncio.as_completed(tasks):
+			yield await fut
+	finally:
+		for task in tasks:
+			task.cancel()
+
+
+async def fetch_many(locations: List[str], kinds: List[str], concurrency: int = 8) -> tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+	"""并发获取多个城市的多类数据（复用缓存与单飞），单项失败或业务错误码记录到 errors 而不影响其他项"""
+	results: Dict[str, Dict[str, Any]] = {}
+	errors: Dict[str, Dict[str, Any]] = {}
+	async for location, data, errs in iter_many(locations, kinds, concurrency):
+		if data:
+			results[location] = data
+		if errs:
+			errors[location] = errs
+	# 保持请求中的城市顺序
+	order = {location: i for i, location in enumerate(locations)}
+	return dict(sorted(results.items(), key=lambda x: order[x[0]])), dict(sorted(errors.items(), key=lambda x: order[x[0]]))
+
+
+async def daily_many(locations: List[str], concurrency: int = 8) -> tuple[Dict[str, CacheEntry], Dict[str, Dict[str, Any]]]:
+	"""并发获取多个城市的 7 天预报条目（跨城市比较用，条目自带记录与派生指标）；失败或业务错误码记录到 errors"""
+	sem = asyncio.Semaphore(max(1, concurrency))
+	locations = list(dict.fromkeys(locations))
+	entries: Dict[str, CacheEntry] = {}
+	errors: Dict[str, Dict[str, Any]] = {}
 
+	async def one(location: str):
+		try:
+			async with sem:
+				entry = await weather_entry("7d", location)
+		except HTTPException as exc:
+			errors[location] = {"status": exc.status_code, "detail": exc.detail}
+			return
+		except Exception as exc:
+			errors[location] = {"status": 502, "detail": str(exc)}
+			return
+		if entry.record is None:
+			errors[location] = {"status": 502, "detail": f"和风返回错误码: {entry.data.get('code')}"}
+		else:
+			entries[location] = entry
 
+	await asyncio.gather(*(one(location) for location in locations))
+	return {loc: entries[loc] for loc in locations if loc in entries}, errors
@@ -0,0 +1,99 @@
+"""和风天气上游熔断器（按主机）
+
+- closed：正常放行；连续失败或连续超出延迟 SLO 达到阈值后 → open
+- open：快速失败（由调用方返回旧数据或 503），冷却期结束后 → half_open
+- half_open：仅放行一个探测请求；成功 → closed，失败 → open
+"""
+import time
+import logging
+from collections import deque
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+	def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 30.0,
+	             latency_slo_seconds: float = 3.0, probe_timeout_seconds: float = 30.0):
+		self.name = name
+		self._failure_threshold = max(1, failure_threshold)
+		self._cooldown = cooldown_seconds
+		self._latency_slo = latency_slo_seconds
+		self._probe_timeout = probe_timeout_seconds
+		self.state = STATE_CLOSED
+		self._consecutive_failures = 0
+		self._opened_at = 0.0
+		self._probe_started: float | None = None
+		self._transitions: Dict[str, int] = {}
+		self._recent: deque = deque(maxlen=20)
+		self.rejected = 0
+
+	def _transition(self, state: str, reason: str):
+		if state == self.state:
+			return
+		edge = f"{self.state}->{state}"
+		self._transitions[edge] = self._transitions.get(edge, 0) + 1
+		self._recent.append({"at": time.time(), "from": self.state, "to": state, "reason": reason})
+		logger.warning(f"QWeather circuit {self.name}: {edge} ({reason})")
+		self.state = state
+		if state == STATE_OPEN:
+			self._opened_at = time.monotonic()
+			self._probe_started = None
+		elif state == STATE_CLOSED:
+			self._consecutive_failures = 0
+			self._probe_started = None
+
+	@property
+	def is_closed(self) -> bool:
+		"""只读判断（不计拒绝数、不占探测名额），用于对冲等可选请求"""
+		return self.state == STATE_CLOSED
+
+	def allow(self) -> bool:
+		"""是否放行本次请求；half_open 时同一时刻只放行一个探测"""
+		now = time.monotonic()
+		if self.state == STATE_OPEN:
+			if now - self._opened_at < self._cooldown:
+				self.rejected += 1
+				return False
+			self._transition(STATE_HALF_OPEN, "cooldown elapsed")
+		if self.state == STATE_HALF_OPEN:
+			# 探测请求被取消等情况下，超时后允许新的探测
+			if self._probe_started is not None and now - self._probe_started < self._probe_timeout:
+				self.rejected += 1
+				return False
+			self._probe_started = now
+		return True
+
+	def release_probe(self):
+		"""放行后未真正请求上游（如配额不足）时归还 half_open 的探测名额，不必等待探测超时"""
+		if self.state == STATE_HALF_OPEN:
+			self._probe_started = None
+
+	def record_success(self, elapsed: float):
+		if elapsed > self._latency_slo:
+			# 超出延迟 SLO 视同一次失败，持续慢响应也会触发熔断
+			self.record_failure(f"slow response {elapsed:.2f}s")
+			return
+		if self.state == STATE_HALF_OPEN:
+			self._transition(STATE_CLOSED, "probe succeeded")
+		self._consecutive_failures = 0
+
+	def record_failure(self, reason: str = "error"):
+		self._consecutive_failures += 1
+		if self.state == STATE_HALF_OPEN:
+			self._transition(STATE_OPEN, f"probe failed: {reason}")
+		elif self.state == STATE_CLOSED and self._consecutive_failures >= self._failure_threshold:
+			self._transition(STATE_OPEN, f"{self._consecutive_failures} consecutive failures: {reason}")
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"state": self.state,
+			"consecutive_failures": self._consecutive_failures,
+			"rejected": self.rejected,
+			"transitions": dict(self._transitions),
+			"recent_transitions": list(self._recent),
+		}
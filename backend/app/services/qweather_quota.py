@@ -0,0 +1,232 @@
+"""和风天气上游调用配额管理
+
+- 每日配额：按 Asia/Shanghai 自然日计数，低优先级通道只能使用预留之外的额度
+- 每秒速率：令牌桶；低优先级通道需给高优先级保留部分令牌，且在有交互请求排队时让行
+- 优先级通过 contextvar 传递，默认 interactive；后台任务用 qweather_priority() 声明
+- 单飞任务持有可提升的 PriorityRef：更高优先级的调用方加入时提升，正在等待的额度申请随之改用新通道
+"""
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+TZ_SH = timezone(timedelta(hours=8))  # Asia/Shanghai 等效
+
+PRIORITY_INTERACTIVE = "interactive"  # 用户正在等待的请求（仪表盘、邮件预览、穿衣建议）
+PRIORITY_SCHEDULED = "scheduled"      # 定时邮件等后台任务
+PRIORITY_PREFETCH = "prefetch"        # 预取/预热，最先让行
+
+
+class Lane(NamedTuple):
+	"""通道策略
+	- daily_reserve: 为更高优先级保留的每日额度比例（该通道用量达到 (1 - reserve) * limit 即拒绝）
+	- token_reserve: 为更高优先级保留的令牌桶比例
+	- max_wait: 等待令牌的最长秒数，超时拒绝
+	"""
+	daily_reserve: float
+	token_reserve: float
+	max_wait: float
+
+
+LANES: Dict[str, Lane] = {
+	PRIORITY_INTERACTIVE: Lane(daily_reserve=0.0, token_reserve=0.0, max_wait=2.0),
+	PRIORITY_SCHEDULED: Lane(daily_reserve=0.2, token_reserve=0.25, max_wait=30.0),
+	PRIORITY_PREFETCH: Lane(daily_reserve=0.4, token_reserve=0.5, max_wait=5.0),
+}
+
+# 数值越小优先级越高
+PRIORITY_RANK: Dict[str, int] = {PRIORITY_INTERACTIVE: 0, PRIORITY_SCHEDULED: 1, PRIORITY_PREFETCH: 2}
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("qweather_priority", default=PRIORITY_INTERACTIVE)
+
+
+class PriorityRef:
+	"""共享上游请求（单飞任务）的优先级，只升不降"""
+	__slots__ = ("value", "_promoted")
+
+	def __init__(self, value: str):
+		self.value = value
+		self._promoted = asyncio.Event()
+
+	def promote(self, priority: str) -> None:
+		if PRIORITY_RANK.get(priority, 0) < PRIORITY_RANK[self.value]:
+			self.value = priority
+			self._promoted.set()
+
+	async def wait_promoted(self, timeout: float) -> None:
+		"""等待至多 timeout 秒，期间被提升则提前返回"""
+		try:
+			await asyncio.wait_for(self._promoted.wait(), timeout=timeout)
+		except asyncio.TimeoutError:
+			pass
+		self._promoted.clear()
+
+
+_priority_ref: contextvars.ContextVar[PriorityRef | None] = contextvars.ContextVar("qweather_priority_ref", default=None)
+
+
+def current_priority() -> str:
+	ref = _priority_ref.get()
+	return ref.value if ref is not None else _priority.get()
+
+
+@contextmanager
+def shared_priority(ref: PriorityRef):
+	"""在该上下文中创建的任务按 ref 的当前值申请额度（ref 可在任务运行期间被提升）"""
+	token = _priority_ref.set(ref)
+	try:
+		yield
+	finally:
+		_priority_ref.reset(token)
+
+
+@contextmanager
+def qweather_priority(priority: str):
+	"""在该上下文中（含其中创建的任务）发起的和风请求使用指定优先级"""
+	token = _priority.set(priority)
+	try:
+		yield
+	finally:
+		_priority.reset(token)
+
+
+class QuotaGovernor:
+	def __init__(self, daily_limit: int, rate_per_second: float, burst: int):
+		self._daily_limit = daily_limit  # 0 表示不限制每日配额
+		self._rate = rate_per_second     # 0 表示不限制速率
+		self._burst = max(1, burst)
+		self._tokens = float(self._burst)
+		self._last_refill = time.monotonic()
+		self._day = self._today()
+		self._used_today = 0
+		self._interactive_waiting = 0
+		self._lane_stats: Dict[str, Dict[str, int]] = {
+			name: {"granted": 0, "rejected": 0, "waited": 0} for name in LANES
+		}
+
+	@staticmethod
+	def _today() -> str:
+		return datetime.now(TZ_SH).strftime("%Y-%m-%d")
+
+	def _roll_day(self):
+		today = self._today()
+		if today != self._day:
+			self._day = today
+			self._used_today = 0
+
+	def _refill(self):
+		now = time.monotonic()
+		self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+		self._last_refill = now
+
+	def _daily_allows(self, lane: Lane) -> bool:
+		if self._daily_limit <= 0:
+			return True
+		return self._used_today < self._daily_limit * (1 - lane.daily_reserve)
+
+	def _reject(self, priority: str, reason: str):
+		self._lane_stats[priority]["rejected"] += 1
+		raise HTTPException(status_code=429, detail={
+			"code": "QWEATHER_QUOTA_EXCEEDED",
+			"message": f"和风天气调用额度不足（{reason}），请稍后再试",
+		})
+
+	async def acquire(self, priority: str | None = None) -> None:
+		"""为一次上游调用申请额度；额度不足或等待超时抛出 429"""
+		# 未显式指定优先级时跟随上下文，单飞任务的优先级在等待期间可能被提升
+		ref = None if priority in LANES else _priority_ref.get()
+		priority = priority if priority in LANES else current_priority()
+		lane = LANES[priority]
+		self._roll_day()
+		if not self._daily_allows(lane):
+			self._reject(priority, "今日配额")
+		if self._rate <= 0:
+			self._used_today += 1
+			self._lane_stats[priority]["granted"] += 1
+			return
+
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + lane.max_wait
+		interactive = False
+		waited = False
+		try:
+			while True:
+				if ref is not None and ref.value != priority:
+					# 等待期间被更高优先级的调用方提升：改用新通道的预留与等待上限
+					priority = ref.value
+					lane = LANES[priority]
+					deadline = min(deadline, loop.time() + lane.max_wait)
+				if not interactive and priority == PRIORITY_INTERACTIVE:
+					interactive = True
+					self._interactive_waiting += 1
+				need = 1 + lane.token_reserve * self._burst
+				self._refill()
+				# 低优先级在有交互请求排队时让行
+				if self._tokens >= need and (interactive or self._interactive_waiting == 0):
+					if not self._daily_allows(lane):
+						self._reject(priority, "今日配额")
+					self._tokens -= 1
+					self._used_today += 1
+					self._lane_stats[priority]["granted"] += 1
+					if waited:
+						self._lane_stats[priority]["waited"] += 1
+					return
+				delay = max((need - self._tokens) / self._rate, 0.01)
+				if loop.time() + delay > deadline:
+					self._reject(priority, "调用频率")
+				waited = True
+				if ref is not None and not interactive:
+					await ref.wait_promoted(delay)
+				else:
+					await asyncio.sleep(delay)
+		finally:
+			if interactive:
+				self._interactive_waiting -= 1
+
+	def try_acquire(self, priority: str | None = None) -> bool:
+		"""不等待地申请一次额度（用于对冲等可选请求），失败不计入拒绝数"""
+		priority = priority if priority in LANES else current_priority()
+		lane = LANES[priority]
+		self._roll_day()
+		if not self._daily_allows(lane) or (priority != PRIORITY_INTERACTIVE and self._interactive_waiting):
+			return False
+		if self._rate > 0:
+			self._refill()
+			if self._tokens < 1 + lane.token_reserve * self._burst:
+				return False
+			self._tokens -= 1
+		self._used_today += 1
+		self._lane_stats[priority]["granted"] += 1
+		return True
+
+	def stats(self) -> Dict[str, object]:
+		self._roll_day()
+		self._refill()
+		remaining = None if self._daily_limit <= 0 else max(0, self._daily_limit - self._used_today)
+		return {
+			"day": self._day,
+			"daily_limit": self._daily_limit,
+			"used_today": self._used_today,
+			"remaining_today": remaining,
+			"remaining_by_lane": {
+				name: None if self._daily_limit <= 0 else max(0, int(self._daily_limit * (1 - lane.daily_reserve)) - self._used_today)
+				for name, lane in LANES.items()
+			},
+			"rate_per_second": self._rate,
+			"tokens_available": round(self._tokens, 2),
+			"lanes": {name: dict(v) for name, v in self._lane_stats.items()},
+		}
+
+
+quota_governor = QuotaGovernor(
+	daily_limit=settings.qweather_daily_quota,
+	rate_per_second=settings.qweather_rate_per_second,
+	burst=settings.qweather_burst,
+)
@@ -0,0 +1,104 @@
+"""和风天气上游重试策略
+
+- RetryPolicy：指数退避 + 全抖动（full jitter），遵循 Retry-After，仅重试网络错误与 429/5xx
+- RetryBudget：重试令牌桶，每个请求存入 ratio 个令牌、每次重试/对冲取出 1 个，
+  并按 min_per_second 缓慢补充，故障期间重试量不超过正常流量的固定比例
+- LatencyTracker：记录最近的上游耗时，对冲请求以 p95 作为触发延迟
+"""
+import time
+import random
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+	max_attempts: int = 3
+	base_delay: float = 0.2
+	max_delay: float = 2.0
+	max_retry_after: float = 5.0
+	retry_statuses: frozenset = frozenset({429, 500, 502, 503, 504})
+
+	def backoff(self, attempt: int) -> float:
+		"""第 attempt 次重试（从 1 开始）前的等待秒数"""
+		return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+	def retry_after(self, response: httpx.Response) -> Optional[float]:
+		"""解析 Retry-After（秒数或 HTTP 日期）；无该头返回 None"""
+		value = response.headers.get("Retry-After")
+		if not value:
+			return None
+		try:
+			return max(0.0, float(value))
+		except ValueError:
+			pass
+		try:
+			when = parsedate_to_datetime(value)
+		except (TypeError, ValueError):
+			return None
+		return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+	def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 10.0):
+		self._ratio = ratio
+		self._min_per_second = min_per_second
+		self._max_tokens = max_tokens
+		self._tokens = max_tokens
+		self._last = time.monotonic()
+		self.exhausted = 0
+
+	def _refill(self):
+		now = time.monotonic()
+		self._tokens = min(self._max_tokens, self._tokens + (now - self._last) * self._min_per_second)
+		self._last = now
+
+	def record_request(self):
+		self._refill()
+		self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+	def available(self) -> bool:
+		"""是否还有可用令牌（不消耗）"""
+		self._refill()
+		return self._tokens >= 1
+
+	def try_spend(self) -> bool:
+		self._refill()
+		if self._tokens >= 1:
+			self._tokens -= 1
+			return True
+		self.exhausted += 1
+		return False
+
+	def stats(self) -> Dict[str, float]:
+		self._refill()
+		return {"tokens": round(self._tokens, 2), "exhausted": self.exhausted}
+
+
+class LatencyTracker:
+	def __init__(self, window: int = 200, min_samples: int = 20):
+		self._samples: deque = deque(maxlen=window)
+		self._min_samples = min_samples
+
+	def record(self, seconds: float):
+		self._samples.append(seconds)
+
+	def percentile(self, p: float) -> Optional[float]:
+		"""样本不足时返回 None"""
+		if len(self._samples) < self._min_samples:
+			return None
+		ordered = sorted(self._samples)
+		return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+	def stats(self) -> Dict[str, Optional[float]]:
+		p50, p95 = self.percentile(0.5), self.percentile(0.95)
+		return {
+			"samples": len(self._samples),
+			"p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+			"p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+		}
@@ -1,12 +1,14 @@
-import os
+import math
 from typing import List, Dict, Any
-from pathlib import Path
 
-from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone
 import google.generativeai as genai
 
+from app.core.runtime_config import get_runtime_config
+from app.services.weather_records import NowRecord, DailyRecord, format_number
+from app.services.weather_metrics import DailyMetrics, HourlyMetrics
+
 
 # 懒加载与单例资源
 _model: SentenceTransformer | None = None
@@ -16,14 +18,9 @@ _index = None
 INDEX_NAME = "fashion-advice"
 
 
-def _ensure_env():
-	load_dotenv(dotenv_path=Path(__file__).resolve().parents[2] / ".env", override=True)
-
-
 def _get_embedder() -> SentenceTransformer:
 	global _model
 	if _model is None:
-		_ensure_env()
 		_model = SentenceTransformer('BAAI/bge-base-zh-v1.5')
 	return _model
 
@@ -31,8 +28,7 @@ def _get_embedder() -> SentenceTransformer:
 def _get_index():
 	global _pc, _index
 	if _index is None:
-		_ensure_env()
-		api_key = os.getenv("PINECONE_API_KEY")
+		api_key = get_runtime_config().pinecone_api_key
 		if not api_key:
 			raise RuntimeError("PINECONE_API_KEY 未配置")
 		_pc = Pinecone(api_key=api_key)
@@ -43,13 +39,65 @@ def _get_index():
 
 
 def _get_gemini():
-	_ensure_env()
-	api_key = os.getenv("GEMINI_API_KEY")
-	if not api_key:
+	cfg = get_runtime_config()
+	if not cfg.gemini_api_key:
 		raise RuntimeError("GEMINI_API_KEY 未配置")
-	genai.configure(api_key=api_key)
-	model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-	return genai.GenerativeModel(model_name)
+	genai.configure(api_key=cfg.gemini_api_key)
+	return genai.GenerativeModel(cfg.gemini_model)
+
+
+def _rounded(value: float) -> str | None:
+	return None if math.isnan(value) else str(round(float(value)))
+
+
+def _span(start: str, end: str) -> str:
+	"""逐小时时段 -> "HH:MM-HH:MM"（结束为最后一小时的下一整点）"""
+	try:
+		end_hour = (int(end[11:13]) + 1) % 24
+	except ValueError:
+		return f"{start[11:16]}-{end[11:16]}"
+	return f"{start[11:16]}-{end_hour:02d}:00"
+
+
+def build_weather_info(
+	city_name: str,
+	now: NowRecord | None,
+	daily: DailyRecord | None,
+	daily_metrics: DailyMetrics | None = None,
+	hourly_metrics: HourlyMetrics | None = None,
+) -> Dict[str, Any]:
+	"""由实时与逐日记录组织结构化天气信息（字段为字符串，缺失为空串/None）；派生指标为预先计算好的数值"""
+	first_day = daily is not None and len(daily) > 0
+	info = {
+		"city_name": city_name,
+		"obs_time": now.obs_time.replace("T", " ").replace("+08:00", "") if now else "",
+		"condition": now.text if now else None,
+		"temp": format_number(now.temp) if now else None,
+		"feels_like": format_number(now.feels_like) if now else None,
+		"wind_dir": now.wind_dir if now else None,
+		"wind_scale": now.wind_scale if now else None,
+		"humidity": format_number(now.humidity) if now else None,
+		"temp_max": format_number(daily.temp_max[0]) if first_day else None,
+		"temp_min": format_number(daily.temp_min[0]) if first_day else None,
+		"dew_point": (format_number(now.dew) or None) if now else None,
+		"apparent_max": None,
+		"apparent_min": None,
+		"comfort": None,
+		# 逐小时指标仅在已有 24 小时缓存时提供，缺失为 None（区别于"无降水时段"的空列表）
+		"rain_windows": None,
+		"best_window": None,
+	}
+	if daily_metrics is not None and len(daily_metrics.dates) > 0:
+		info["apparent_max"] = _rounded(daily_metrics.apparent_max[0])
+		info["apparent_min"] = _rounded(daily_metrics.apparent_min[0])
+		info["comfort"] = _rounded(daily_metrics.comfort[0])
+		if info["dew_point"] is None:
+			info["dew_point"] = _rounded(daily_metrics.dew_point[0])
+	if hourly_metrics is not None:
+		info["rain_windows"] = [_span(w["start"], w["end"]) for w in hourly_metrics.rain_windows]
+		if hourly_metrics.best_window:
+			info["best_window"] = _span(hourly_metrics.best_window["start"], hourly_metrics.best_window["end"])
+	return info
 
 
 def build_query_from_weather(info: Dict[str, Any]) -> str:
@@ -81,6 +129,12 @@ def retrieve_rag_context(query: str, top_k: int = 4) -> str:
 
 def generate_advice(weather_info: Dict[str, Any], rag_context: str) -> str:
 	model = _get_gemini()
+	hourly_lines = ""
+	if weather_info.get('rain_windows') is not None:
+		hourly_lines = (
+			f"\n降水时段：{'、'.join(weather_info['rain_windows']) or '无'}"
+			f"\n适宜出门时段：{weather_info.get('best_window') or '无'}"
+		)
 	prompt = f"""
 你是一名专业的穿搭顾问。请基于以下 RAG 知识库内容与实时天气信息，为用户生成今日穿衣建议。
 
@@ -96,10 +150,13 @@ def generate_advice(weather_info: Dict[str, Any], rag_context: str) -> str:
 风向/风力：{weather_info.get('wind_dir')} {weather_info.get('wind_scale')}级
 湿度：{weather_info.get('humidity')}%
 今日最高/最低：{weather_info.get('temp_max')}°C / {weather_info.get('temp_min')}°C
+今日体感（白天/夜间）：{weather_info.get('apparent_max') or '未知'}°C / {weather_info.get('apparent_min') or '未知'}°C
+露点：{weather_info.get('dew_point') or '未知'}°C
+舒适度：{weather_info.get('comfort') or '未知'}/100{hourly_lines}
 
 [要求]
 - 输出 4 条要点，每条不超过 40 字，务必可执行
-- 若有降雨或大风，增加防护与材质建议
+- 若有降雨或大风，增加防护与材质建议；有降水时段时提醒避开或带伞
 - 先给整体风格定位，再给关键单品
 - 语气温和专业，避免夸张词
 """.strip()
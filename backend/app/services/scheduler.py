@@ -7,6 +7,7 @@ from sqlalchemy import select
 
 from app.database.models import EmailSchedule
 from app.services.notification_service import notification_service
+from app.services.qweather_quota import qweather_priority, PRIORITY_SCHEDULED
 
 
 class EmailScheduleWorker:
@@ -40,13 +41,15 @@ class EmailScheduleWorker:
 				return
 			for sch in schedules:
 				try:
-					ok, preview, _ = await notification_service.send_now(
-						db,
-						sch.user_id,
-						sch.email,
-						sch.city_id,
-						sch.city_name or ""
-					)
+					# 定时发送走后台通道，配额紧张时让行给交互请求
+					with qweather_priority(PRIORITY_SCHEDULED):
+						ok, preview, _ = await notification_service.send_now(
+							db,
+							sch.user_id,
+							sch.email,
+							sch.city_id,
+							sch.city_name or ""
+						)
 					sch.last_run_at = utc_now
 					if sch.type == "DAILY":
 						# 每日任务，设定下一次执行时间（+1 天）
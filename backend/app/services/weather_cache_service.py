@@ -1,11 +1,22 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-import json
+from typing import Optional, Dict, Any, List
+import asyncio
+import hashlib
+import logging
 
 from app.database.models.weather_cache import WeatherCache
 
+logger = logging.getLogger(__name__)
+
+
+def hash_cache_key(cache_key: str) -> str:
+    """qweather 缓存键可能较长，落库时使用固定长度的哈希"""
+    return hashlib.sha256(cache_key.encode("utf-8")).hexdigest()
+
 
 class WeatherCacheService:
     async def get_cached_weather(self, db: AsyncSession, city_name: str, 
@@ -81,6 +92,50 @@ class WeatherCacheService:
             "expired_count": expired_count
         }
     
+    async def get_by_cache_key(self, db: AsyncSession, cache_key: str) -> Optional[WeatherCache]:
+        """按 qweather 缓存键读取未硬过期的条目"""
+        result = await db.execute(
+            select(WeatherCache).where(
+                WeatherCache.cache_key == hash_cache_key(cache_key),
+                WeatherCache.expires_at > datetime.utcnow()
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def bulk_upsert(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+        """批量写入 qweather 缓存条目：按唯一的 cache_key 单条语句 upsert，
+        多个 worker 同时写入同一键时不会因先删后插产生唯一键冲突或死锁"""
+        if not rows:
+            return 0
+        values = [
+            {
+                "cache_key": hash_cache_key(r["cache_key"]),
+                "city_name": (r["location"] or "")[:100],
+                "weather_type": r["weather_type"],
+                "weather_data": r["weather_data"],
+                "fetched_at": r["fetched_at"],
+                "soft_expires_at": r["soft_expires_at"],
+                "expires_at": r["expires_at"],
+            }
+            for r in rows
+        ]
+        updated = ("city_name", "weather_type", "weather_data", "fetched_at", "soft_expires_at", "expires_at")
+        if db.bind.dialect.name == "mysql":
+            stmt = mysql_insert(WeatherCache).values(values)
+            stmt = stmt.on_duplicate_key_update(
+                **{name: stmt.inserted[name] for name in updated}, updated_at=func.now()
+            )
+        else:
+            # 开发环境的 SQLite
+            stmt = sqlite_insert(WeatherCache).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["cache_key"],
+                set_={**{name: stmt.excluded[name] for name in updated}, "updated_at": func.now()},
+            )
+        await db.execute(stmt)
+        await db.commit()
+        return len(rows)
+    
     async def clear_all_cache(self, db: AsyncSession) -> int:
         """清理所有缓存"""
         result = await db.execute(delete(WeatherCache))
@@ -89,3 +144,100 @@ class WeatherCacheService:
 
 
 weather_cache_service = WeatherCacheService()
+
+
+class WeatherCacheWriter:
+    """二级缓存的异步批量写入器（write-behind）
+    - submit() 只把条目放入内存待写表，请求路径不等待 MySQL
+    - 同一缓存键多次提交只保留最新值
+    - 每 flush_interval 秒或积累到 batch_size 条时批量落库
+    - 每 purge_interval 秒清理一次硬过期条目
+    """
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], flush_interval: float = 2.0,
+                 batch_size: int = 200, max_pending: int = 5000, purge_interval: float = 600.0):
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._max_pending = max_pending
+        self._purge_interval = purge_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"queued": 0, "dropped": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def submit(self, cache_key: str, location: str, weather_type: str, weather_json: str,
+               fetched_at: datetime, soft_expires_at: datetime, expires_at: datetime) -> None:
+        """weather_json 为上游原始 JSON 文本，原样落库，读取时无需重新序列化；时间均为 naive UTC"""
+        if cache_key not in self._pending and len(self._pending) >= self._max_pending:
+            # 数据库跟不上时丢弃新条目，保证内存有界
+            self.stats["dropped"] += 1
+            return
+        self._pending[cache_key] = {
+            "cache_key": cache_key,
+            "location": location,
+            "weather_type": weather_type,
+            "weather_data": weather_json,
+            "fetched_at": fetched_at,
+            "soft_expires_at": soft_expires_at,
+            "expires_at": expires_at,
+        }
+        self.stats["queued"] += 1
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        rows = list(self._pending.values())
+        self._pending.clear()
+        written = 0
+        for i in range(0, len(rows), self._batch_size):
+            batch = rows[i:i + self._batch_size]
+            try:
+                async with self._session_factory() as db:
+                    written += await weather_cache_service.bulk_upsert(db, batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Weather cache write-behind error: {e}")
+        self.stats["written"] += written
+        return written
+
+    async def _purge(self):
+        try:
+            async with self._session_factory() as db:
+                await weather_cache_service.clear_expired_cache(db)
+        except Exception as e:
+            logger.error(f"Weather cache purge error: {e}")
+
+    async def _loop(self):
+        self._running = True
+        loop = asyncio.get_running_loop()
+        next_purge = loop.time() + self._purge_interval
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if loop.time() >= next_purge:
+                next_purge = loop.time() + self._purge_interval
+                await self._purge()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop(), name="weather-cache-writer")
+
+    async def stop(self):
+        self._running = False
+        self._wakeup.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=self._flush_interval + 5)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+        # 退出前写完剩余条目
+        await self.flush()
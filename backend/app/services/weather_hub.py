@@ -0,0 +1,197 @@
+"""实时天气订阅中心
+
+- 每个被订阅的城市只有一个轮询任务：按 interval 经 qweather 层（复用缓存/单飞/配额）获取实时天气，
+  与上一次快照比较，只把变化的字段推送给该城市的所有订阅者；最后一个订阅者离开时停止轮询
+- 每个订阅者一个有界队列：消费过慢导致队列满时清空积压、改为下发一次全量快照（resync），
+  连续落后超过 max_lag 次（期间从未取空队列）则断开该订阅者，避免单个慢连接占用内存或拖慢推送
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services import qweather
+from app.services.qweather_quota import qweather_priority, PRIORITY_SCHEDULED
+
+logger = logging.getLogger(__name__)
+
+MAX_LOCATIONS_PER_SUBSCRIBER = 20
+
+# 队列中的控制标记
+_RESYNC = object()
+_CLOSE = object()
+
+
+class Subscriber:
+	def __init__(self, hub: "WeatherHub", queue_size: int):
+		self._hub = hub
+		self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+		self.locations: Set[str] = set()
+		self.lagged = 0
+		self.dropped = 0
+		self.closed = False
+
+	def offer(self, message: Dict[str, Any]) -> None:
+		"""由轮询任务调用，不阻塞；队列满时丢弃积压并标记需要全量快照"""
+		if self.closed:
+			return
+		try:
+			self._queue.put_nowait(message)
+			return
+		except asyncio.QueueFull:
+			pass
+		self.dropped += self._queue.qsize()
+		while not self._queue.empty():
+			self._queue.get_nowait()
+		self.lagged += 1
+		self._hub.stats["resyncs"] += 1
+		if self.lagged > self._hub.max_lag:
+			self._hub.stats["slow_disconnects"] += 1
+			self.closed = True
+			self._queue.put_nowait(_CLOSE)
+		else:
+			self._queue.put_nowait(_RESYNC)
+
+	def close(self) -> None:
+		if not self.closed:
+			self.closed = True
+			while not self._queue.empty():
+				self._queue.get_nowait()
+			self._queue.put_nowait(_CLOSE)
+
+	async def next_messages(self) -> Optional[List[Dict[str, Any]]]:
+		"""等待下一批待发送消息；订阅被关闭时返回 None"""
+		item = await self._queue.get()
+		if self._queue.empty():
+			# 已追上推送：落后次数按连续计算，重新计数
+			self.lagged = 0
+		if item is _CLOSE:
+			return None
+		if item is _RESYNC:
+			return self._hub.snapshots(self.locations)
+		return [item]
+
+
+class WeatherHub:
+	def __init__(self, interval_seconds: float = 60, queue_size: int = 32, max_lag: int = 5):
+		self._interval = interval_seconds
+		self._queue_size = max(queue_size, MAX_LOCATIONS_PER_SUBSCRIBER)
+		self.max_lag = max_lag
+		self._subscribers: Dict[str, Set[Subscriber]] = {}
+		self._pollers: Dict[str, asyncio.Task] = {}
+		self._snapshots: Dict[str, Dict[str, Any]] = {}
+		self.stats = {"polls": 0, "updates": 0, "messages": 0, "resyncs": 0, "slow_disconnects": 0, "errors": 0}
+
+	def connect(self) -> Subscriber:
+		return Subscriber(self, self._queue_size)
+
+	def subscribe(self, sub: Subscriber, locations: Iterable[str]) -> List[str]:
+		"""订阅城市；已有快照的城市立即下发全量，返回实际新增的城市"""
+		added = []
+		for location in locations:
+			if location in sub.locations:
+				continue
+			if len(sub.locations) >= MAX_LOCATIONS_PER_SUBSCRIBER:
+				raise HTTPException(status_code=422, detail=f"单个连接最多订阅 {MAX_LOCATIONS_PER_SUBSCRIBER} 个城市")
+			sub.locations.add(location)
+			self._subscribers.setdefault(location, set()).add(sub)
+			added.append(location)
+			if location not in self._pollers:
+				self._pollers[location] = asyncio.create_task(self._poll(location))
+			elif location in self._snapshots:
+				sub.offer(self._snapshot_message(location))
+		return added
+
+	def unsubscribe(self, sub: Subscriber, locations: Optional[Iterable[str]] = None) -> None:
+		for location in list(sub.locations if locations is None else locations):
+			sub.locations.discard(location)
+			subs = self._subscribers.get(location)
+			if subs is None:
+				continue
+			subs.discard(sub)
+			if not subs:
+				# 最后一个订阅者离开：停止轮询并丢弃快照
+				del self._subscribers[location]
+				task = self._pollers.pop(location, None)
+				if task is not None:
+					task.cancel()
+				self._snapshots.pop(location, None)
+
+	def disconnect(self, sub: Subscriber) -> None:
+		self.unsubscribe(sub)
+		sub.close()
+
+	def _snapshot_message(self, location: str) -> Dict[str, Any]:
+		snap = self._snapshots[location]
+		return {"type": "snapshot", "location": location, "updateTime": snap.get("updateTime"),
+				"stale": snap.get("stale", False), "now": snap.get("now", {})}
+
+	def snapshots(self, locations: Iterable[str]) -> List[Dict[str, Any]]:
+		return [self._snapshot_message(loc) for loc in locations if loc in self._snapshots]
+
+	def _publish(self, location: str, message: Dict[str, Any]) -> None:
+		for sub in list(self._subscribers.get(location, ())):
+			sub.offer(message)
+			self.stats["messages"] += 1
+			if sub.closed:
+				self.unsubscribe(sub)
+
+	@staticmethod
+	def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+		return {k: v for k, v in new.items() if old.get(k) != v}
+
+	async def _poll(self, location: str) -> None:
+		while True:
+			try:
+				with qweather_priority(PRIORITY_SCHEDULED):
+					data = await qweather.weather_now(location)
+				self.stats["polls"] += 1
+				if isinstance(data, dict) and data.get("code") == "200":
+					self._apply(location, data)
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				self.stats["errors"] += 1
+				logger.warning("实时天气轮询失败 %s: %s", location, e)
+			await asyncio.sleep(self._interval)
+
+	def _apply(self, location: str, data: Dict[str, Any]) -> None:
+		old = self._snapshots.get(location)
+		snap = {"updateTime": data.get("updateTime"), "stale": bool(data.get("stale")), "now": data.get("now", {})}
+		self._snapshots[location] = snap
+		if old is None:
+			self._publish(location, self._snapshot_message(location))
+			return
+		changes = self._diff(old["now"], snap["now"])
+		if not changes and old["stale"] == snap["stale"]:
+			return
+		self.stats["updates"] += 1
+		self._publish(location, {
+			"type": "update",
+			"location": location,
+			"updateTime": snap["updateTime"],
+			"stale": snap["stale"],
+			"changes": changes,
+			"ts": int(time.time()),
+		})
+
+	async def stop(self) -> None:
+		for sub in {s for subs in self._subscribers.values() for s in subs}:
+			sub.close()
+		tasks = list(self._pollers.values())
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self._pollers.clear()
+		self._subscribers.clear()
+		self._snapshots.clear()
+
+	def get_stats(self) -> Dict[str, Any]:
+		subscribers = {s for subs in self._subscribers.values() for s in subs}
+		return {**self.stats, "locations": len(self._pollers), "subscribers": len(subscribers)}
+
+
+weather_hub = WeatherHub(interval_seconds=settings.weather_subscribe_interval)
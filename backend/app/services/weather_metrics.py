@@ -0,0 +1,261 @@
+"""预报派生指标（NumPy 向量化）
+
+基于 weather_records 的数值列一次性计算整列结果，不逐字段循环：
+- 逐小时（24h）：露点、热指数、风寒、体感、舒适度、降水时段、最佳出行时段
+- 逐日（7d / 3d）：白天体感上限/夜间体感下限、露点、舒适度、降水日
+
+温度单位均为 °C，风速 km/h，缺失值为 nan（输出为 null）。
+结果随缓存条目保存（CacheEntry.metrics），与预报数据同时过期。
+"""
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.weather_records import HourlyRecord, DailyRecord, WeatherRecord
+
+# 降水时段：降水概率不低于该值或有降水量
+RAIN_POP_THRESHOLD = 50.0
+# 最佳出行时段：白天范围（含）与窗口长度（小时）
+DAYTIME_HOURS = (6, 21)
+BEST_WINDOW_HOURS = 2
+# 舒适度的理想体感温度
+COMFORT_TEMP = 22.0
+
+
+def dew_point(temp: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+	"""露点（Magnus 公式）"""
+	rh = np.clip(humidity, 1.0, 100.0)
+	gamma = np.log(rh / 100.0) + 17.62 * temp / (243.12 + temp)
+	return 243.12 * gamma / (17.62 - gamma)
+
+
+def heat_index(temp: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+	"""热指数（NOAA：Steadman 简式，偏热时用 Rothfusz 回归及修正项）"""
+	t = temp * 9.0 / 5.0 + 32.0
+	rh = humidity
+	simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+	full = (
+		-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+		- 0.00683783 * t * t - 0.05481717 * rh * rh + 0.00122874 * t * t * rh
+		+ 0.00085282 * t * rh * rh - 0.00000199 * t * t * rh * rh
+	)
+	dry = (rh < 13) & (t >= 80) & (t <= 112)
+	full = full - np.where(dry, (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), 0.0)
+	humid = (rh > 85) & (t >= 80) & (t <= 87)
+	full = full + np.where(humid, (rh - 85) / 10 * (87 - t) / 5, 0.0)
+	hi = np.where((simple + t) / 2 >= 80, full, simple)
+	return (hi - 32.0) * 5.0 / 9.0
+
+
+def wind_chill(temp: np.ndarray, wind_kmh: np.ndarray) -> np.ndarray:
+	"""风寒温度（加拿大环境部公式），仅在 ≤10°C 且风速 >4.8 km/h 时生效，否则为气温本身"""
+	v = np.power(np.clip(wind_kmh, 0, None), 0.16)
+	wc = 13.12 + 0.6215 * temp - 11.37 * v + 0.3965 * temp * v
+	return np.where((temp <= 10) & (wind_kmh > 4.8), wc, temp)
+
+
+def apparent_temperature(temp: np.ndarray, humidity: np.ndarray, wind_kmh: np.ndarray) -> np.ndarray:
+	"""体感：≥27°C 取热指数，≤10°C 取风寒，其间为气温"""
+	return np.where(temp >= 27, heat_index(temp, humidity), np.where(temp <= 10, wind_chill(temp, wind_kmh), temp))
+
+
+def comfort_score(apparent: np.ndarray, humidity: np.ndarray, wind_kmh: np.ndarray, rain: np.ndarray) -> np.ndarray:
+	"""舒适度 0~100：体感偏离 22°C、湿度超出 30%~70%、风速超过 20 km/h、降水（概率或 mm 折算）各自扣分"""
+	score = (
+		100.0
+		- 3.5 * np.abs(apparent - COMFORT_TEMP)
+		- 0.5 * np.clip(humidity - 70, 0, None)
+		- 0.5 * np.clip(30 - humidity, 0, None)
+		- 1.0 * np.clip(wind_kmh - 20, 0, None)
+		- 0.3 * rain
+	)
+	return np.clip(score, 0.0, 100.0)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+	"""布尔序列中连续为 True 的区间 [start, end)"""
+	edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+	return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _values(arr: np.ndarray, ndigits: int = 1) -> List[Optional[float]]:
+	return [None if np.isnan(v) else round(float(v), ndigits) for v in arr]
+
+
+def _float(value: Any, ndigits: int = 1) -> Optional[float]:
+	return None if value is None or np.isnan(value) else round(float(value), ndigits)
+
+
+class HourlyMetrics:
+	__slots__ = ("times", "dew_point", "heat_index", "wind_chill", "apparent", "comfort", "rain_windows", "best_window")
+
+	@classmethod
+	def from_record(cls, rec: HourlyRecord) -> "HourlyMetrics":
+		temp = np.asarray(rec.temp, dtype=np.float64)
+		humidity = np.asarray(rec.humidity, dtype=np.float64)
+		wind = np.asarray(rec.wind_speed, dtype=np.float64)
+		pop = np.nan_to_num(np.asarray(rec.pop, dtype=np.float64))
+		precip = np.nan_to_num(np.asarray(rec.precip, dtype=np.float64))
+
+		m = cls()
+		m.times = rec.times
+		m.dew_point = dew_point(temp, humidity)
+		m.heat_index = heat_index(temp, humidity)
+		m.wind_chill = wind_chill(temp, wind)
+		m.apparent = apparent_temperature(temp, humidity, wind)
+		m.comfort = comfort_score(m.apparent, humidity, wind, pop)
+
+		rainy = (pop >= RAIN_POP_THRESHOLD) | (precip > 0)
+		starts, ends = _runs(rainy)
+		if len(starts):
+			# reduceat 在相邻下标之间归约：交错传入 [start, end) 并取偶数位，避免把时段后的无雨小时算进去
+			bounds = np.column_stack((starts, ends)).ravel()
+			# 末段 end 可能等于数组长度，补一个哑元素使其成为合法下标
+			max_pop = np.maximum.reduceat(np.append(pop, 0.0), bounds)[::2]
+			total = np.add.reduceat(np.append(precip, 0.0), bounds)[::2]
+		else:
+			max_pop = total = np.empty(0)
+		m.rain_windows = [
+			{"start": rec.times[s], "end": rec.times[e - 1], "hours": int(e - s), "maxPop": round(float(p)), "precip": round(float(t), 1)}
+			for s, e, p, t in zip(starts, ends, max_pop, total)
+		]
+		m.best_window = cls._best_window(rec.times, m.comfort, rainy)
+		return m
+
+	@staticmethod
+	def _best_window(times: Sequence[str], comfort: np.ndarray, rainy: np.ndarray) -> Optional[Dict[str, Any]]:
+		"""白天、无降水的连续 BEST_WINDOW_HOURS 小时中平均舒适度最高的时段"""
+		k = BEST_WINDOW_HOURS
+		if len(times) < k:
+			return None
+		hours = np.array([int(t[11:13]) if len(t) >= 13 else -1 for t in times])
+		usable = (hours >= DAYTIME_HOURS[0]) & (hours <= DAYTIME_HOURS[1]) & ~rainy & ~np.isnan(comfort)
+		score = np.where(usable, comfort, 0.0)
+		# 窗口内需全部可用：可用小时数等于 k
+		window_score = np.convolve(score, np.ones(k), "valid") / k
+		window_ok = np.convolve(usable.astype(np.int8), np.ones(k, dtype=np.int8), "valid") == k
+		if not window_ok.any():
+			return None
+		i = int(np.argmax(np.where(window_ok, window_score, -1.0)))
+		return {"start": times[i], "end": times[i + k - 1], "comfort": round(float(window_score[i]))}
+
+	def nbytes(self) -> int:
+		arrays = (self.dew_point, self.heat_index, self.wind_chill, self.apparent, self.comfort)
+		windows = self.rain_windows + ([self.best_window] if self.best_window else [])
+		return sys.getsizeof(self) + sum(sys.getsizeof(a) for a in arrays) + sys.getsizeof(self.rain_windows) + sum(
+			sys.getsizeof(w) + sum(sys.getsizeof(v) for v in w.values()) for w in windows)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"times": list(self.times),
+			"dewPoint": _values(self.dew_point),
+			"heatIndex": _values(self.heat_index),
+			"windChill": _values(self.wind_chill),
+			"apparent": _values(self.apparent),
+			"comfort": _values(self.comfort, 0),
+			"rainWindows": self.rain_windows,
+			"bestWindow": self.best_window,
+		}
+
+
+class DailyMetrics:
+	__slots__ = ("dates", "apparent_max", "apparent_min", "dew_point", "comfort", "rain_days")
+
+	@classmethod
+	def from_record(cls, rec: DailyRecord) -> "DailyMetrics":
+		temp_max = np.asarray(rec.temp_max, dtype=np.float64)
+		temp_min = np.asarray(rec.temp_min, dtype=np.float64)
+		humidity = np.asarray(rec.humidity, dtype=np.float64)
+		wind_day = np.asarray(rec.wind_speed_day, dtype=np.float64)
+		wind_night = np.asarray(rec.wind_speed_night, dtype=np.float64)
+		precip = np.nan_to_num(np.asarray(rec.precip, dtype=np.float64))
+
+		m = cls()
+		m.dates = rec.dates
+		# 白天按最高气温，夜间按最低气温与夜间风速
+		m.apparent_max = apparent_temperature(temp_max, humidity, wind_day)
+		m.apparent_min = apparent_temperature(temp_min, humidity, wind_night)
+		m.dew_point = dew_point((temp_max + temp_min) / 2, humidity)
+		# 日降水量按 1mm 折算 4 个降水概率点
+		m.comfort = comfort_score((m.apparent_max + m.apparent_min) / 2, humidity, wind_day, np.clip(precip * 4, 0, 100))
+		m.rain_days = [rec.dates[i] for i in np.flatnonzero(precip >= 0.1)]
+		return m
+
+	def nbytes(self) -> int:
+		arrays = (self.apparent_max, self.apparent_min, self.dew_point, self.comfort)
+		return sys.getsizeof(self) + sum(sys.getsizeof(a) for a in arrays) + sys.getsizeof(self.rain_days)
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"dates": list(self.dates),
+			"apparentMax": _values(self.apparent_max),
+			"apparentMin": _values(self.apparent_min),
+			"dewPoint": _values(self.dew_point),
+			"comfort": _values(self.comfort, 0),
+			"rainDays": self.rain_days,
+		}
+
+
+WeatherMetrics = HourlyMetrics | DailyMetrics
+
+
+def compute_metrics(record: Optional[WeatherRecord]) -> Optional[WeatherMetrics]:
+	"""按记录类型计算派生指标；实时天气与无记录时返回 None"""
+	if isinstance(record, HourlyRecord):
+		return HourlyMetrics.from_record(record)
+	if isinstance(record, DailyRecord):
+		return DailyMetrics.from_record(record)
+	return None
+
+
+# 跨城市比较可用的逐日指标：名称 -> 取列函数
+COMPARE_FIELDS = {
+	"temp_max": lambda rec, m: rec.temp_max,
+	"temp_min": lambda rec, m: rec.temp_min,
+	"apparent_max": lambda rec, m: m.apparent_max,
+	"apparent_min": lambda rec, m: m.apparent_min,
+	"comfort": lambda rec, m: m.comfort,
+	"precip": lambda rec, m: rec.precip,
+	"humidity": lambda rec, m: rec.humidity,
+	"uv_index": lambda rec, m: rec.uv_index,
+}
+
+
+def compare_daily(
+	rows: Dict[str, Tuple[DailyRecord, DailyMetrics]], day: int, field: str, descending: bool = True,
+) -> List[Dict[str, Any]]:
+	"""把各城市的逐日列堆叠为 [城市, 天] 矩阵，按第 day 天的 field 排序（缺失值排最后）"""
+	locations = list(rows)
+	if not locations:
+		return []
+	days = max(len(rec) for rec, _ in rows.values())
+	matrix = np.full((len(locations), days), np.nan)
+	for i, location in enumerate(locations):
+		rec, m = rows[location]
+		column = np.asarray(COMPARE_FIELDS[field](rec, m), dtype=np.float64)
+		matrix[i, :len(column)] = column
+	values = matrix[:, day] if day < days else np.full(len(locations), np.nan)
+	key = np.where(np.isnan(values), np.inf, -values if descending else values)
+	order = np.argsort(key, kind="stable")
+	return [
+		{
+			"location": locations[i],
+			"date": rows[locations[i]][0].dates[day] if day < len(rows[locations[i]][0]) else None,
+			"value": _float(values[i]),
+		}
+		for i in order
+	]
+
+
+def compare_summary(
+	entries: Dict[str, Any], errors: Dict[str, Any], day: int, field: str, descending: bool = True,
+	names: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+	"""比较接口的响应体；entries 为 location -> 7 天预报缓存条目（带 record 与 metrics），names 为可选的城市名"""
+	ranking = compare_daily({loc: (e.record, e.metrics) for loc, e in entries.items()}, day, field, descending)
+	if names:
+		for item in ranking:
+			item["name"] = names.get(item["location"])
+	best = ranking[0] if ranking and ranking[0]["value"] is not None else None
+	return {"metric": field, "day": day, "order": "desc" if descending else "asc", "best": best, "ranking": ranking, "errors": errors}
@@ -0,0 +1,179 @@
+"""和风天气数据的紧凑表示
+
+上游 JSON 中数值均为字符串（"temp": "23"），且多数字段内部不会读取。
+这里把 now / 24h / 7d(3d) 解析为：
+- NowRecord：__slots__ 记录，数值为 float（缺失为 nan）
+- HourlyRecord / DailyRecord：按列存储，数值列为 array('f')，文本列为元组
+
+重复出现的短文本（天气现象、风向等）经 sys.intern 在所有条目间共享同一对象。
+供内部调用方（通知、穿衣建议等）使用；对外接口仍直接返回上游原文。
+"""
+import math
+import sys
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+NAN = float("nan")
+
+
+def _num(value: Any) -> float:
+	if value is None or value == "":
+		return NAN
+	try:
+		return float(value)
+	except (TypeError, ValueError):
+		return NAN
+
+
+def _text(value: Any) -> str:
+	return sys.intern(value) if isinstance(value, str) else ""
+
+
+def format_number(value: float) -> str:
+	"""还原为上游的字符串写法：整数不带小数点，缺失为空串"""
+	if math.isnan(value):
+		return ""
+	return str(int(value)) if value == int(value) else f"{value:g}"
+
+
+def _column(items: List[Dict[str, Any]], field: str) -> array:
+	return array("f", (_num(item.get(field)) for item in items))
+
+
+def _texts(items: List[Dict[str, Any]], field: str) -> Tuple[str, ...]:
+	return tuple(_text(item.get(field)) for item in items)
+
+
+def _sizeof(value: Any, shared: bool) -> int:
+	"""字段的近似内存：数组按实际缓冲区计算；shared 为 intern 过的文本，各条目共享，只计引用"""
+	if isinstance(value, tuple):
+		return sys.getsizeof(value) + (0 if shared else sum(sys.getsizeof(v) for v in value))
+	if isinstance(value, str) and shared:
+		return 0
+	return sys.getsizeof(value)
+
+
+class _Record:
+	__slots__ = ()
+	# 经 sys.intern 共享的文本字段
+	_SHARED: frozenset = frozenset()
+
+	def nbytes(self) -> int:
+		return sys.getsizeof(self) + sum(_sizeof(getattr(self, name), name in self._SHARED) for name in self.__slots__)
+
+
+class NowRecord(_Record):
+	__slots__ = (
+		"update_time", "obs_time", "text", "icon", "wind_dir", "wind_scale",
+		"temp", "feels_like", "humidity", "wind360", "wind_speed", "precip", "pressure", "vis", "cloud", "dew",
+	)
+	_SHARED = frozenset(("text", "icon", "wind_dir", "wind_scale"))
+
+	@classmethod
+	def from_data(cls, data: Dict[str, Any]) -> "NowRecord":
+		now = data.get("now") or {}
+		rec = cls()
+		rec.update_time = data.get("updateTime") or ""
+		rec.obs_time = now.get("obsTime") or ""
+		rec.text = _text(now.get("text"))
+		rec.icon = _text(now.get("icon"))
+		rec.wind_dir = _text(now.get("windDir"))
+		rec.wind_scale = _text(now.get("windScale"))
+		rec.temp = _num(now.get("temp"))
+		rec.feels_like = _num(now.get("feelsLike"))
+		rec.humidity = _num(now.get("humidity"))
+		rec.wind360 = _num(now.get("wind360"))
+		rec.wind_speed = _num(now.get("windSpeed"))
+		rec.precip = _num(now.get("precip"))
+		rec.pressure = _num(now.get("pressure"))
+		rec.vis = _num(now.get("vis"))
+		rec.cloud = _num(now.get("cloud"))
+		rec.dew = _num(now.get("dew"))
+		return rec
+
+
+class HourlyRecord(_Record):
+	__slots__ = (
+		"update_time", "times", "texts", "icons",
+		"temp", "humidity", "pop", "precip", "wind_speed", "wind360", "pressure", "cloud", "dew",
+	)
+	_SHARED = frozenset(("texts", "icons"))
+
+	@classmethod
+	def from_data(cls, data: Dict[str, Any]) -> "HourlyRecord":
+		hourly = data.get("hourly") or []
+		rec = cls()
+		rec.update_time = data.get("updateTime") or ""
+		rec.times = tuple(item.get("fxTime") or "" for item in hourly)
+		rec.texts = _texts(hourly, "text")
+		rec.icons = _texts(hourly, "icon")
+		rec.temp = _column(hourly, "temp")
+		rec.humidity = _column(hourly, "humidity")
+		rec.pop = _column(hourly, "pop")
+		rec.precip = _column(hourly, "precip")
+		rec.wind_speed = _column(hourly, "windSpeed")
+		rec.wind360 = _column(hourly, "wind360")
+		rec.pressure = _column(hourly, "pressure")
+		rec.cloud = _column(hourly, "cloud")
+		rec.dew = _column(hourly, "dew")
+		return rec
+
+	def __len__(self) -> int:
+		return len(self.times)
+
+
+class DailyRecord(_Record):
+	__slots__ = (
+		"update_time", "dates", "text_day", "text_night", "wind_dir_day", "wind_scale_day",
+		"sunrise", "sunset", "moon_phase",
+		"temp_max", "temp_min", "humidity", "precip", "uv_index", "wind_speed_day", "wind_speed_night",
+		"pressure", "vis", "cloud",
+	)
+	_SHARED = frozenset(("text_day", "text_night", "wind_dir_day", "wind_scale_day", "sunrise", "sunset", "moon_phase"))
+
+	@classmethod
+	def from_data(cls, data: Dict[str, Any]) -> "DailyRecord":
+		daily = data.get("daily") or []
+		rec = cls()
+		rec.update_time = data.get("updateTime") or ""
+		rec.dates = tuple(item.get("fxDate") or "" for item in daily)
+		rec.text_day = _texts(daily, "textDay")
+		rec.text_night = _texts(daily, "textNight")
+		rec.wind_dir_day = _texts(daily, "windDirDay")
+		rec.wind_scale_day = _texts(daily, "windScaleDay")
+		rec.sunrise = _texts(daily, "sunrise")
+		rec.sunset = _texts(daily, "sunset")
+		rec.moon_phase = _texts(daily, "moonPhase")
+		rec.temp_max = _column(daily, "tempMax")
+		rec.temp_min = _column(daily, "tempMin")
+		rec.humidity = _column(daily, "humidity")
+		rec.precip = _column(daily, "precip")
+		rec.uv_index = _column(daily, "uvIndex")
+		rec.wind_speed_day = _column(daily, "windSpeedDay")
+		rec.wind_speed_night = _column(daily, "windSpeedNight")
+		rec.pressure = _column(daily, "pressure")
+		rec.vis = _column(daily, "vis")
+		rec.cloud = _column(daily, "cloud")
+		return rec
+
+	def __len__(self) -> int:
+		return len(self.dates)
+
+
+WeatherRecord = NowRecord | HourlyRecord | DailyRecord
+
+_PARSERS: Dict[str, Callable[[Dict[str, Any]], WeatherRecord]] = {
+	"now": NowRecord.from_data,
+	"24h": HourlyRecord.from_data,
+	"7d": DailyRecord.from_data,
+	"3d": DailyRecord.from_data,
+}
+
+
+def parse_record(kind: str, data: Any) -> Optional[WeatherRecord]:
+	"""按数据类型解析；不支持的类型（如城市搜索）或业务错误码返回 None"""
+	parser = _PARSERS.get(kind)
+	if parser is None or not isinstance(data, dict) or data.get("code") != "200":
+		return None
+	return parser(data)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+城市和风ID回填脚本
+为已有收藏与热门城市批量解析和风 location id，并写入 cities 表
+（优先使用本地城市索引，未命中才请求和风；按 scheduled 优先级占用配额）
+
+用法：python backend/backfill_city_locations.py [--include-popular 200]
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.database.connection import init_db, close_db, AsyncSessionLocal  # noqa: E402
+from app.database.models.city import City  # noqa: E402
+from app.database.models.user_favorite import UserFavorite  # noqa: E402
+from app.services import qweather, gazetteer  # noqa: E402
+from app.services.city_service import city_service  # noqa: E402
+from app.services.qweather_quota import qweather_priority, PRIORITY_SCHEDULED  # noqa: E402
+
+
+async def main(include_popular: int) -> int:
+    print("🚀 开始回填城市和风ID...")
+    # init_db 会为已有 cities 表补齐 location_id 等新列
+    await init_db()
+    gazetteer.load(settings.gazetteer_index_path or None)
+    await qweather.startup()
+
+    resolved = failed = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(UserFavorite.city_name, UserFavorite.province).distinct())
+            names = {(row.city_name, row.province) for row in result.all()}
+            if include_popular > 0:
+                result = await db.execute(
+                    select(City.city_name, City.province)
+                    .where(City.location_id.is_(None))
+                    .order_by(City.search_count.desc())
+                    .limit(include_popular)
+                )
+                names.update((row.city_name, row.province) for row in result.all())
+            print(f"📋 待解析城市: {len(names)}")
+
+            with qweather_priority(PRIORITY_SCHEDULED):
+                for city_name, province in sorted(names, key=lambda x: (x[1] or "", x[0])):
+                    try:
+                        location_id = await city_service.resolve_location_id(db, city_name, province)
+                    except HTTPException as e:
+                        location_id = None
+                        print(f"   ⚠️ {province or ''} {city_name}: {e.detail}")
+                    if location_id:
+                        resolved += 1
+                    else:
+                        failed += 1
+                        print(f"   ❌ {province or ''} {city_name}: 未找到和风ID")
+    finally:
+        await qweather.shutdown()
+        gazetteer.close()
+        await close_db()
+
+    print(f"✅ 回填完成：成功 {resolved}，失败 {failed}")
+    print(f"📊 和风请求次数: {qweather.get_stats()['upstream_calls']}")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--include-popular", type=int, default=200, help="同时回填搜索次数最多的 N 个未解析城市（0 为不回填）")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.include_popular)))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+天气/城市接口响应序列化与压缩基准
+
+对比默认 JSONResponse（jsonable_encoder + json.dumps）与 ORJSONResponse / MessagePack / 缓存原文直出，
+以及 identity / gzip / brotli 下的传输字节数。
+
+用法：python backend/benchmarks/bench_responses.py [--iterations 2000]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+import orjson  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse, Response  # noqa: E402
+
+from app.core.compression import brotli  # noqa: E402
+from app.core.responses import msgpack, MsgPackResponse  # noqa: E402
+
+
+def sample_24h() -> dict:
+    """与和风 /v7/weather/24h 结构一致的示例数据"""
+    return {
+        "code": "200",
+        "updateTime": "2025-08-21T10:35+08:00",
+        "fxLink": "https://www.qweather.com/weather/beijing-101010100.html",
+        "hourly": [
+            {
+                "fxTime": f"2025-08-21T{h % 24:02d}:00+08:00", "temp": str(20 + h % 8), "icon": "101",
+                "text": "多云", "wind360": "135", "windDir": "东南风", "windScale": "1-3", "windSpeed": "9",
+                "humidity": str(60 + h % 20), "pop": str(h % 5 * 5), "precip": "0.0", "pressure": "1003",
+                "cloud": "40", "dew": "18",
+            }
+            for h in range(24)
+        ],
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]},
+    }
+
+
+def sample_7d() -> dict:
+    """与和风 /v7/weather/7d 结构一致的示例数据"""
+    return {
+        "code": "200",
+        "updateTime": "2025-08-21T10:35+08:00",
+        "fxLink": "https://www.qweather.com/weather/beijing-101010100.html",
+        "daily": [
+            {
+                "fxDate": f"2025-08-{21 + d}", "sunrise": "05:30", "sunset": "19:05", "moonrise": "23:10",
+                "moonset": "14:20", "moonPhase": "亏凸月", "moonPhaseIcon": "805", "tempMax": str(30 + d),
+                "tempMin": str(21 + d), "iconDay": "100", "textDay": "晴", "iconNight": "151", "textNight": "多云",
+                "wind360Day": "180", "windDirDay": "南风", "windScaleDay": "1-3", "windSpeedDay": "3",
+                "wind360Night": "0", "windDirNight": "北风", "windScaleNight": "1-3", "windSpeedNight": "3",
+                "humidity": "65", "precip": "0.0", "pressure": "1002", "vis": "25", "cloud": "5", "uvIndex": "7",
+            }
+            for d in range(7)
+        ],
+        "refer": {"sources": ["QWeather"], "license": ["QWeather Developers License"]},
+    }
+
+
+def cpu_us(fn, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, payload in (("24h", sample_24h()), ("7d", sample_7d())):
+        default_body = JSONResponse(jsonable_encoder(payload)).body
+        orjson_body = ORJSONResponse(payload).body
+        print(f"\n=== /api/weather/{name} ===")
+        print(f"{'方案':<28}{'CPU/请求(µs)':>14}{'字节':>10}")
+        print(f"{'JSONResponse (默认)':<28}{cpu_us(lambda: JSONResponse(jsonable_encoder(payload)), args.iterations):>14.1f}{len(default_body):>10}")
+        print(f"{'ORJSONResponse':<28}{cpu_us(lambda: ORJSONResponse(payload), args.iterations):>14.1f}{len(orjson_body):>10}")
+        # 缓存命中时直接写出上游原文（对比 解析 + 重新序列化）
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        print(f"{'解析 + ORJSONResponse':<28}{cpu_us(lambda: ORJSONResponse(orjson.loads(raw)), args.iterations):>14.1f}{len(orjson_body):>10}")
+        print(f"{'原文直出 Response':<28}{cpu_us(lambda: Response(raw, media_type='application/json'), args.iterations):>14.1f}{len(raw):>10}")
+        if msgpack is not None:
+            print(f"{'MsgPackResponse':<28}{cpu_us(lambda: MsgPackResponse(payload), args.iterations):>14.1f}{len(MsgPackResponse(payload).body):>10}")
+        gz = gzip.compress(orjson_body, compresslevel=6)
+        print(f"{'orjson + gzip(6)':<28}{cpu_us(lambda: gzip.compress(ORJSONResponse(payload).body, compresslevel=6), args.iterations):>14.1f}{len(gz):>10}")
+        if brotli is not None:
+            br = brotli.compress(orjson_body, quality=4)
+            print(f"{'orjson + brotli(4)':<28}{cpu_us(lambda: brotli.compress(ORJSONResponse(payload).body, quality=4), args.iterations):>14.1f}{len(br):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+由和风天气城市列表 CSV 生成本地城市索引（供 /api/geo 本地检索）
+
+CSV 下载：https://github.com/qwd/LocationList （China-City-List-latest.csv）
+需要 pypinyin 生成拼音全拼/首字母检索键（“bj” -> 北京），未安装时直接退出。
+
+用法：python backend/gazetteer/build_index.py China-City-List-latest.csv [--out backend/gazetteer/locations.idx]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.gazetteer import DEFAULT_INDEX_PATH, read_location_csv, write_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", help="和风城市列表 CSV 路径")
+    parser.add_argument("--out", default=str(DEFAULT_INDEX_PATH), help="索引输出路径")
+    args = parser.parse_args()
+
+    try:
+        import pypinyin  # noqa: F401
+    except ImportError:
+        sys.exit("构建城市索引需要 pypinyin 以生成拼音检索键，请先执行 pip install -r backend/requirements-build.txt")
+
+    places = read_location_csv(args.csv)
+    info = write_index(places, args.out)
+    print(f"已生成 {args.out}：{info['places']} 个地点，{info['keys']} 个检索键，{info['bytes'] / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,16 +50,13 @@ export function useWeatherApi() {
     errorMsg.value = ''
     
     try {
-      console.log('[req] weather for city:', cityId)
-      const [nowRes, hRes, dRes] = await Promise.all([
-        http.get('/weather/now', { params: { location: cityId } }),
-        http.get('/weather/24h', { params: { location: cityId } }),
-        http.get('/weather/7d', { params: { location: cityId } }),
-      ])
+      console.log('[req] GET /api/weather/bundle', { location: cityId })
+      // 实时 + 24小时 + 7天由后端一次返回，减少往返
+      const { data } = await http.get('/weather/bundle', { params: { location: cityId } })
       
-      const currentWeather: CurrentWeather = nowRes.data
-      const hourlyWeather: HourlyWeather[] = hRes.data?.hourly?.slice(0, 24) || []
-      const dailyWeather: DailyWeather[] = dRes.data?.daily || []
+      const currentWeather: CurrentWeather = data.current
+      const hourlyWeather: HourlyWeather[] = data.hourly || []
+      const dailyWeather: DailyWeather[] = data.daily || []
       
       // 调试信息
       console.log('📊 天气数据加载完成:')